@@ -1,15 +1,23 @@
 #!/usr/bin/env python3
 """Multi-style Xiaohongshu card renderer (Pillow only)."""
 
-import argparse
+from __future__ import annotations
+
+import atexit
+import functools
 import json
 import os
 import re
 import sys
 import unicodedata
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
+from typing import TYPE_CHECKING, Callable
 
-from PIL import Image, ImageDraw, ImageFont
+# Pillow is imported inside the functions that rasterize, so importing this
+# module (or running --help) does not pay for it.
+if TYPE_CHECKING:
+    from PIL import Image, ImageDraw, ImageFont
 
 CARD_W, CARD_H = 1080, 1440
 FONT_TITLE_PATH = "/System/Library/Fonts/STHeiti Medium.ttc"
@@ -19,10 +27,28 @@ EMOJI_FONT_PATH = "/System/Library/Fonts/Apple Color Emoji.ttc"
 STYLE_CHOICES = ["typography-card", "notes-app", "text-only", "hook-cover"]
 _EMOJI_FONT_SIZES = [20, 40, 48, 64, 96, 160]
 _EMOJI_FONT_CACHE: dict[int, ImageFont.FreeTypeFont | None] = {}
+_TEXT_MASK_CACHE: dict[tuple[str, int, str], tuple[Image.Image, tuple[int, int]]] = {}
+
+# PNG encoding releases the GIL, so batch renderers hand finished cards to
+# this pool and lay out the next card while the previous one is written.
+_IO_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="card-save")
+atexit.register(_IO_POOL.shutdown)
+# Content cards are fanned out to worker processes only when each worker gets
+# at least this many cards. Measured: a spawned worker (macOS default) costs
+# ~0.35s to re-import Pillow and load fonts, while a card renders in ~40ms, so
+# two workers only pay off from ~20 cards. Everyday briefs (5-10 items) stay
+# in-process.
+_MIN_CARDS_PER_WORKER = 12
 
 
 def _font(size: int, title: bool = False) -> ImageFont.FreeTypeFont:
-    path = FONT_TITLE_PATH if title else FONT_BODY_PATH
+    return _load_font(FONT_TITLE_PATH if title else FONT_BODY_PATH, size)
+
+
+@functools.lru_cache(maxsize=None)
+def _load_font(path: str, size: int) -> ImageFont.FreeTypeFont:
+    from PIL import ImageFont
+
     if not os.path.exists(path):
         raise FileNotFoundError(f"Required font not found: {path}")
     return ImageFont.truetype(path, size)
@@ -45,13 +71,13 @@ def _text_width(text: str, font: ImageFont.FreeTypeFont) -> int:
             if is_emoji:
                 if not emoji_font:
                     continue
-                box = emoji_font.getbbox(segment)
+                width += int(emoji_font.getlength(segment))
             else:
-                box = font.getbbox(segment)
-            width += box[2] - box[0]
+                width += int(font.getlength(segment))
         return width
-    box = font.getbbox(text)
-    return box[2] - box[0]
+    # Advance width only: wrapping and highlight placement never need the
+    # vertical extents that getbbox() also computes.
+    return int(font.getlength(text))
 
 
 def _supported_emoji_size(size: int) -> int:
@@ -67,6 +93,8 @@ def _load_emoji_font(size: int) -> ImageFont.FreeTypeFont | None:
         _EMOJI_FONT_CACHE[normalized] = None
         return None
     try:
+        from PIL import ImageFont
+
         emoji_font = ImageFont.truetype(EMOJI_FONT_PATH, normalized)
     except Exception:
         emoji_font = None
@@ -132,6 +160,8 @@ def _draw_text_with_emoji(
         draw.text(xy, text, fill=fill, font=font)
         return _text_width(text, font)
 
+    from PIL import Image, ImageDraw
+
     x, y = xy
     rendered_width = 0
     emoji_font = _load_emoji_font(emoji_size)
@@ -168,6 +198,36 @@ def _draw_text_with_emoji(
     return rendered_width
 
 
+def _text_mask(text: str, font: ImageFont.FreeTypeFont) -> tuple[Image.Image, tuple[int, int]]:
+    key = (font.path, font.size, text)
+    cached = _TEXT_MASK_CACHE.get(key)
+    if cached is not None:
+        return cached
+    from PIL import Image, ImageDraw
+
+    left, top, right, bottom = font.getbbox(text)
+    mask = Image.new("L", (max(right - left, 1), max(bottom - top, 1)))
+    ImageDraw.Draw(mask).text((-left, -top), text, fill=255, font=font)
+    _TEXT_MASK_CACHE[key] = (mask, (left, top))
+    return mask, (left, top)
+
+
+def _paste_text(
+    img: Image.Image,
+    xy: tuple[int, int],
+    text: str,
+    font: ImageFont.FreeTypeFont,
+    fill: tuple,
+) -> None:
+    """Draw recurring text (brand, page indicator) from a cached glyph mask.
+
+    Pixel-identical to ``draw.text`` but rasterizes each string only once
+    per font, which pays off for labels repeated on every card.
+    """
+    mask, (dx, dy) = _text_mask(text, font)
+    img.paste(fill, (xy[0] + dx, xy[1] + dy), mask)
+
+
 def _wrap_text(text: str, font: ImageFont.FreeTypeFont, max_width: int) -> list[str]:
     """Wrap text respecting English word boundaries.
     
@@ -242,15 +302,36 @@ def _save(img: Image.Image, output_path: str) -> str:
     return output_path
 
 
+def _save_async(img: Image.Image, output_path: str) -> Future[str]:
+    """Queue ``img`` for writing; the caller must not draw on it afterwards."""
+    return _IO_POOL.submit(_save, img, output_path)
+
+
+def _new_canvas(bg: tuple[int, int, int] = (0, 0, 0)) -> tuple[Image.Image, ImageDraw.ImageDraw]:
+    from PIL import Image, ImageDraw
+
+    img = Image.new("RGB", (CARD_W, CARD_H), bg)
+    return img, ImageDraw.Draw(img)
+
+
+def _clear_canvas(
+    canvas: tuple[Image.Image, ImageDraw.ImageDraw], bg: tuple[int, int, int]
+) -> tuple[Image.Image, ImageDraw.ImageDraw]:
+    """Fill a reusable (img, draw) pair with ``bg`` so it can host the next card."""
+    img, draw = canvas
+    draw.rectangle((0, 0, CARD_W, CARD_H), fill=bg)
+    return img, draw
+
+
 def _split_sections(text: str) -> list[list[str]]:
-    raw_parts = [part.strip() for part in (text or "").split("---")]
+    text = text or ""
     sections: list[list[str]] = []
-    for part in raw_parts:
-        lines = [ln.strip() for ln in part.splitlines() if ln.strip()]
+    for part in text.split("---"):
+        lines = [ln for ln in map(str.strip, part.splitlines()) if ln]
         if lines:
             sections.append(lines)
     if not sections:
-        lines = [ln.strip() for ln in (text or "").splitlines() if ln.strip()]
+        lines = [ln for ln in map(str.strip, text.splitlines()) if ln]
         if lines:
             sections.append(lines)
     return sections
@@ -379,6 +460,10 @@ def _draw_divider(draw: ImageDraw.ImageDraw, y: int, color: tuple[int, int, int]
 
 
 def render_typography_cover(content_data: dict, output_path: str) -> str:
+    return _save(_render_typography_cover(content_data), output_path)
+
+
+def _render_typography_cover(content_data: dict) -> Image.Image:
     bg = _hex("F5F0E8")
     title_color = _hex("8B4513")
     body_color = _hex("6B3A0A")
@@ -386,8 +471,7 @@ def render_typography_cover(content_data: dict, output_path: str) -> str:
     divider_color = _hex("D5BFA7")
     accent = _hex("C4923A")
 
-    img = Image.new("RGB", (CARD_W, CARD_H), bg)
-    draw = ImageDraw.Draw(img)
+    img, draw = _new_canvas(bg)
 
     margin = 84
     width = CARD_W - margin * 2
@@ -478,7 +562,7 @@ def render_typography_cover(content_data: dict, output_path: str) -> str:
         emoji_size=40,
     )
 
-    return _save(img, output_path)
+    return img
 
 
 def render_typography_single_card(title: str, body: str, output_path: str) -> str:
@@ -491,7 +575,12 @@ def render_typography_single_card(title: str, body: str, output_path: str) -> st
     return _save(img, output_path)
 
 
-def _render_typography_content_block(block: dict, index: int = 0, total: int = 0) -> Image.Image:
+def _render_typography_content_block(
+    block: dict,
+    index: int = 0,
+    total: int = 0,
+    canvas: tuple[Image.Image, ImageDraw.ImageDraw] | None = None,
+) -> Image.Image:
     bg = _hex("F5F0E8")
     title_color = _hex("8B4513")
     body_color = _hex("6B3A0A")
@@ -500,8 +589,7 @@ def _render_typography_content_block(block: dict, index: int = 0, total: int = 0
     accent = _hex("C4923A")
     quote_bg = _hex("EDE5D8")
 
-    img = Image.new("RGB", (CARD_W, CARD_H), bg)
-    draw = ImageDraw.Draw(img)
+    img, draw = _clear_canvas(canvas, bg) if canvas else _new_canvas(bg)
 
     margin = 84
     width = CARD_W - margin * 2
@@ -587,42 +675,27 @@ def _render_typography_content_block(block: dict, index: int = 0, total: int = 0
     brand_font = _font(36, title=True)
     brand_text = "AI搞钱指南"
     bw = _text_width(brand_text, brand_font)
-    draw.text(((CARD_W - bw) // 2, brand_zone_top + 60), brand_text,
-              fill=_hex("FFFFFF"), font=brand_font)
+    _paste_text(img, ((CARD_W - bw) // 2, brand_zone_top + 60), brand_text, brand_font, _hex("FFFFFF"))
     # Page indicator
     if index > 0 and total > 0:
         page_font = _font(80, title=True)
         page_text = f"{index}/{total}"
         pw = _text_width(page_text, page_font)
-        draw.text(((CARD_W - pw) // 2, brand_zone_top + 120), page_text,
-                  fill=_hex("FFFFFF"), font=page_font)
+        _paste_text(img, ((CARD_W - pw) // 2, brand_zone_top + 120), page_text, page_font, _hex("FFFFFF"))
 
     return img
 
 
 def render_typography_cards(content_data: dict, output_dir: str) -> list[str]:
-    os.makedirs(output_dir, exist_ok=True)
-    paths: list[str] = []
-
-    cover_path = os.path.join(output_dir, "00_cover.png")
-    paths.append(render_typography_cover(content_data, cover_path))
+    return _render_card_set("typography-card", content_data, output_dir, _render_typography_cover)
 
-    blocks = _collect_blocks(content_data)
-    total = len(blocks)
-    for idx, block in enumerate(blocks, 1):
-        path = os.path.join(output_dir, f"{idx:02d}.png")
-        img = _render_typography_content_block(block, index=idx, total=total)
-        paths.append(_save(img, path))
-
-    return paths
 
-
-def _draw_notes_top_bar(draw: ImageDraw.ImageDraw) -> None:
+def _draw_notes_top_bar(img: Image.Image, draw: ImageDraw.ImageDraw) -> None:
     gold = _hex("D4A000")
     white = _hex("FFFFFF")
 
     draw.rectangle((0, 0, CARD_W, 152), fill=white)
-    draw.text((48, 56), "< 备忘录", fill=gold, font=_font(38, title=False))
+    _paste_text(img, (48, 56), "< 备忘录", _font(38, title=False), gold)
 
     # Share icon (box + arrow)
     ix = CARD_W - 190
@@ -704,10 +777,9 @@ def _render_notes_cover(content_data: dict) -> Image.Image:
     muted = _hex("777777")
     light_gray = _hex("E9E9E9")
 
-    img = Image.new("RGB", (CARD_W, CARD_H), bg)
-    draw = ImageDraw.Draw(img)
+    img, draw = _new_canvas(bg)
 
-    _draw_notes_top_bar(draw)
+    _draw_notes_top_bar(img, draw)
 
     margin = 70
     width = CARD_W - margin * 2
@@ -785,17 +857,20 @@ def _render_notes_cover(content_data: dict) -> Image.Image:
     return img
 
 
-def _render_notes_content_block(block: dict, index: int) -> Image.Image:
+def _render_notes_content_block(
+    block: dict,
+    index: int,
+    canvas: tuple[Image.Image, ImageDraw.ImageDraw] | None = None,
+) -> Image.Image:
     bg = _hex("FFFFFF")
     text_color = _hex("333333")
     muted = _hex("666666")
     yellow = _hex("FFE066")
     green = _hex("90EE90")
 
-    img = Image.new("RGB", (CARD_W, CARD_H), bg)
-    draw = ImageDraw.Draw(img)
+    img, draw = _clear_canvas(canvas, bg) if canvas else _new_canvas(bg)
 
-    _draw_notes_top_bar(draw)
+    _draw_notes_top_bar(img, draw)
 
     margin = 70
     width = CARD_W - margin * 2
@@ -828,33 +903,92 @@ def _render_notes_content_block(block: dict, index: int) -> Image.Image:
         if y > CARD_H - 140:
             break
 
-    draw.text((margin, CARD_H - 84), "AI搞钱指南", fill=muted, font=_font(28, title=False))
+    _paste_text(img, (margin, CARD_H - 84), "AI搞钱指南", _font(28, title=False), muted)
     return img
 
 
 def render_notes_app_cards(content_data: dict, output_dir: str) -> list[str]:
-    os.makedirs(output_dir, exist_ok=True)
-    paths: list[str] = []
+    return _render_card_set("notes-app", content_data, output_dir, _render_notes_cover)
 
-    cover_path = os.path.join(output_dir, "00_cover.png")
-    paths.append(_save(_render_notes_cover(content_data), cover_path))
 
-    blocks = _collect_blocks(content_data)
-    for idx, block in enumerate(blocks, 1):
-        path = os.path.join(output_dir, f"{idx:02d}.png")
-        paths.append(_save(_render_notes_content_block(block, idx), path))
+def _render_content_card(
+    style_id: str,
+    block: dict,
+    index: int,
+    total: int,
+    canvas: tuple[Image.Image, ImageDraw.ImageDraw],
+) -> Image.Image:
+    if style_id == "notes-app":
+        return _render_notes_content_block(block, index, canvas=canvas)
+    return _render_typography_content_block(block, index=index, total=total, canvas=canvas)
 
+
+def _render_card_batch(style_id: str, jobs: list[tuple[int, dict]], total: int, output_dir: str) -> list[str]:
+    """Worker-process entry point: render and save a contiguous run of content cards."""
+    canvas = _new_canvas()
+    paths: list[str] = []
+    for idx, block in jobs:
+        img = _render_content_card(style_id, block, idx, total, canvas)
+        paths.append(_save(img, os.path.join(output_dir, f"{idx:02d}.png")))
     return paths
 
 
+def _render_card_set(
+    style_id: str,
+    content_data: dict,
+    output_dir: str,
+    render_cover: Callable[[dict], Image.Image] | None,
+) -> list[str]:
+    """Render cover + one card per block, fanning out to processes for long sets.
+
+    With ``render_cover=None`` only the content cards are produced.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    cover_path = os.path.join(output_dir, "00_cover.png")
+    blocks = _collect_blocks(content_data)
+    total = len(blocks)
+    jobs = list(enumerate(blocks, 1))
+
+    workers = min(os.cpu_count() or 1, total // _MIN_CARDS_PER_WORKER)
+    if workers > 1:
+        size = -(-total // workers)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Submit before drawing the cover so workers start while it renders.
+            batches = [
+                pool.submit(_render_card_batch, style_id, jobs[i : i + size], total, output_dir)
+                for i in range(0, total, size)
+            ]
+            paths = [_save(render_cover(content_data), cover_path)] if render_cover else []
+            for batch in batches:
+                paths.extend(batch.result())
+        return paths
+
+    pending = [_save_async(render_cover(content_data), cover_path)] if render_cover else []
+    # Double-buffer: draw into one canvas while the writer encodes the other, and
+    # wait for a canvas's previous save before drawing over it — no per-card copy.
+    canvases = (_new_canvas(), _new_canvas())
+    writes: list[Future[str] | None] = [None, None]
+    for n, (idx, block) in enumerate(jobs):
+        slot = n % 2
+        if writes[slot] is not None:
+            writes[slot].result()
+        img = _render_content_card(style_id, block, idx, total, canvases[slot])
+        writes[slot] = _save_async(img, os.path.join(output_dir, f"{idx:02d}.png"))
+        pending.append(writes[slot])
+    return [future.result() for future in pending]
+
+
 def render_text_only_cover(content_data: dict, output_dir: str) -> list[str]:
     os.makedirs(output_dir, exist_ok=True)
+    cover_path = os.path.join(output_dir, "00_cover.png")
+    return [_save(_render_text_only_cover(content_data), cover_path)]
+
 
+def _render_text_only_cover(content_data: dict) -> Image.Image:
     top = _hex("F5F6F2")
     bottom = _hex("E2E6EC")
 
-    img = Image.new("RGB", (CARD_W, CARD_H), top)
-    draw = ImageDraw.Draw(img)
+    img, draw = _new_canvas(top)
 
     # Soft vertical gradient
     for y in range(CARD_H):
@@ -918,8 +1052,7 @@ def render_text_only_cover(content_data: dict, output_dir: str) -> list[str]:
     draw.line((margin, CARD_H - 180, CARD_W - margin, CARD_H - 180), fill=_hex("C8CCD2"), width=2)
     _draw_text_with_emoji(img, draw, (margin, CARD_H - 136), "AI搞钱指南", brand_font, _hex("999999"), emoji_size=40)
 
-    cover_path = os.path.join(output_dir, "00_cover.png")
-    return [_save(img, cover_path)]
+    return img
 
 
 def _tokenize_cover_lines(text: str) -> list[str]:
@@ -953,6 +1086,10 @@ def _find_highlight_word(line: str) -> str | None:
 
 
 def render_hook_cover(content_data: dict, output_path: str) -> str:
+    return _save(_render_hook_cover(content_data), output_path)
+
+
+def _render_hook_cover(content_data: dict) -> Image.Image:
     """Render a hook-style cover: big bold text, one highlight, decorative quotes.
 
     Inspired by high-performing XHS covers: minimal, bold, curiosity-driven.
@@ -964,8 +1101,7 @@ def render_hook_cover(content_data: dict, output_path: str) -> str:
     highlight_bg = (166, 222, 120)  # #A6DE78 vivid lime — visible at thumbnail
     footer_color = (170, 165, 155)
 
-    img = Image.new("RGB", (CARD_W, CARD_H), bg)
-    draw = ImageDraw.Draw(img)
+    img, draw = _new_canvas(bg)
 
     margin = 90
     title = _get_title(content_data)
@@ -1073,7 +1209,7 @@ def render_hook_cover(content_data: dict, output_path: str) -> str:
     footer_font = _font(28, title=False)
     _draw_text_with_emoji(img, draw, (margin, CARD_H - 90), "AI搞钱指南", footer_font, footer_color, emoji_size=40)
 
-    return _save(img, output_path)
+    return img
 
 
 def render_hook_cover_cards(content_data: dict, output_dir: str) -> list[str]:
@@ -1103,6 +1239,29 @@ def render_notes_app_cards_from_data(content_data: dict, output_dir: str) -> lis
     return render_notes_app_cards(content_data, output_dir)
 
 
+_COVER_RENDERERS: dict[str, Callable[[dict], Image.Image]] = {
+    "typography-card": _render_typography_cover,
+    "notes-app": _render_notes_cover,
+    "text-only": _render_text_only_cover,
+    "hook-cover": _render_hook_cover,
+}
+
+
+def render_cover(style_id: str, content_data: dict, output_path: str) -> str:
+    """Render only the cover card of ``style_id`` (same image generate_cards puts first)."""
+    renderer = _COVER_RENDERERS.get(style_id, _render_typography_cover)
+    return _save(renderer(content_data), output_path)
+
+
+def render_content_cards(style_id: str, content_data: dict, output_dir: str) -> list[str]:
+    """Render only the per-block cards (01.png, 02.png, …); cover-only styles return []."""
+    if style_id not in ("typography-card", "notes-app"):
+        if style_id in _COVER_RENDERERS:
+            return []
+        style_id = "typography-card"
+    return _render_card_set(style_id, content_data, output_dir, render_cover=None)
+
+
 def generate_cards(style_id: str, content_data: dict, output_dir: str) -> list[str]:
     """Main entry point. Dispatches to style-specific renderer."""
     renderers = {
@@ -1147,7 +1306,41 @@ def generate_cover(style_id: str, title: str, subtitle: str, output_path: str) -
     return render_typography_cover(data, output_path)
 
 
+def _parse_batch_argv(argv: list[str]) -> dict | None:
+    """Parse ``batch`` flags by hand; None means "let argparse handle it".
+
+    Pipelines only ever call ``batch``, so the common invocation skips
+    importing argparse and building the subparser tree. Anything unusual
+    (help, unknown or missing flags, bad style) falls back to argparse so
+    errors and usage text stay the same.
+    """
+    flags = {"-i": "input", "--input": "input", "-o": "output_dir", "--output-dir": "output_dir", "--style": "style"}
+    opts = {"style": "typography-card"}
+    it = iter(argv)
+    for arg in it:
+        key, sep, value = arg.partition("=")
+        if key not in flags or (sep and not key.startswith("--")):
+            return None
+        if not sep:
+            value = next(it, None)
+            if value is None:
+                return None
+        opts[flags[key]] = value
+    if "input" not in opts or "output_dir" not in opts or opts["style"] not in STYLE_CHOICES:
+        return None
+    return opts
+
+
 def main() -> None:
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        opts = _parse_batch_argv(sys.argv[2:])
+        if opts is not None:
+            paths = generate_cards_from_json(opts["input"], opts["output_dir"], style_id=opts["style"])
+            print(json.dumps(paths, ensure_ascii=False, indent=2))
+            return
+
+    import argparse
+
     parser = argparse.ArgumentParser(description="Multi-style RedNote card renderer")
     sub = parser.add_subparsers(dest="command")
 
@@ -1,22 +1,49 @@
 #!/usr/bin/env python3
 """小红书内容精修器（Gemini 多类型路由）。"""
 
+from __future__ import annotations
+
 import argparse
+import codecs
+import contextlib
+import hashlib
+import io
 import json
 import os
+import re
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import gemini
+import hedge
+import response_cache
+from fileutil import atomic_write_text
 
-try:
+if TYPE_CHECKING:
     from google import genai
-    from google.genai import types
-except ImportError:
-    print("需要 google-genai: pip install google-genai", file=sys.stderr)
-    sys.exit(1)
 
 MODEL_PRIMARY = os.environ.get("REDNOTE_MODEL", "gemini-3.1-pro-preview")
 MODEL_FALLBACK = "gemini-3-flash-preview"
 
+# 送给模型的素材上限（字符数）
+MAX_DIGEST_CHARS = 30000
+# 单次生成的输出 token 上限（生成耗时随输出 token 线性增长）
+MAX_OUTPUT_TOKENS = 8192
+# 批量生成时按份数放大上限，但不超过模型支持的最大输出
+MAX_BATCH_OUTPUT_TOKENS = 65536
+
+# Gemini 显式上下文缓存（REDNOTE_CONTEXT_CACHE=1 开启）：system prompt 上传一次，
+# TTL 内的请求（包括之后的进程）按句柄引用，不再重复计费和预填充
+CONTEXT_CACHE_ENABLED = os.environ.get("REDNOTE_CONTEXT_CACHE", "") not in ("", "0")
+CONTEXT_CACHE_TTL = 3600
+_CONTEXT_CACHE_INDEX = response_cache.CACHE_DIR / "context_caches.json"
+_context_cache_lock = threading.Lock()
+
 CONTENT_TYPES = ["brief", "analysis", "opinion", "tools"]
 
 SYSTEM_PROMPTS = {
@@ -115,21 +142,11 @@ def _build_user_prompt(digest_text: str, date_str: str, content_type: str) -> st
         "---\n"
         f"{digest_text}\n"
         "---\n\n"
-        "严格按照系统提示要求输出 JSON。确保 JSON 完整可解析，不要截断。"
+        "严格按照系统提示要求输出 JSON。确保 JSON 完整可解析，不要截断。\n"
+        "输出紧凑 JSON（不要缩进和多余空行），字段写到够用即止，不要任何解释。"
     )
 
 
-def _extract_json(text: str) -> str:
-    data = text.strip()
-    if "```json" in data:
-        data = data.split("```json", 1)[1]
-        data = data.split("```", 1)[0]
-    elif "```" in data:
-        data = data.split("```", 1)[1]
-        data = data.split("```", 1)[0]
-    return data.strip()
-
-
 def _validate_output(data: dict, content_type: str) -> None:
     required_by_type = {
         "brief": ["items", "post_body"],
@@ -157,63 +174,162 @@ def _validate_output(data: dict, content_type: str) -> None:
             sys.exit(1)
 
 
+def _context_cache(client: genai.Client, model: str, system_prompt: str) -> str | None:
+    """返回 system prompt 对应的缓存句柄；未开启或创建失败时返回 None（照常内联发送）。
+
+    句柄和过期时间记在本地索引里，跨进程复用。prompt 低于模型的最小缓存 token 数时
+    创建会失败，失败也记下来，TTL 内不再重试。
+    """
+    if not CONTEXT_CACHE_ENABLED:
+        return None
+    key = hashlib.sha256(f"{model}\x00{system_prompt}".encode("utf-8")).hexdigest()
+    with _context_cache_lock:
+        entry = _load_context_cache_index().get(key)
+    # 留 60 秒余量，避免请求途中句柄过期
+    if entry and entry["expires"] - 60 > time.time():
+        return entry["name"]
+
+    # 创建走网络，不持锁：主模型和 fallback 的请求各自创建，互不阻塞
+    _, types = gemini.import_genai()
+    try:
+        cache = client.caches.create(
+            model=model,
+            config=types.CreateCachedContentConfig(
+                system_instruction=system_prompt,
+                ttl=f"{CONTEXT_CACHE_TTL}s",
+            ),
+        )
+        name = cache.name
+    except Exception as e:
+        print(f"⚠️ 上下文缓存不可用，内联发送 system prompt: {e}", file=sys.stderr)
+        name = None
+    with _context_cache_lock:
+        # 写前重读，保留其他线程/进程期间写入的条目
+        index = _load_context_cache_index()
+        index[key] = {"name": name, "expires": time.time() + CONTEXT_CACHE_TTL}
+        _write_context_cache_index(index)
+    return name
+
+
+def _load_context_cache_index() -> dict:
+    try:
+        index = json.loads(_CONTEXT_CACHE_INDEX.read_bytes())
+    except (OSError, ValueError):
+        return {}
+    return index if isinstance(index, dict) else {}
+
+
+def _write_context_cache_index(index: dict) -> None:
+    """原子写入，并发的进程不会读到写了一半的索引；写失败忽略。"""
+    with contextlib.suppress(OSError):
+        atomic_write_text(_CONTEXT_CACHE_INDEX, json.dumps(index))
+
+
+def _request(
+    client: genai.Client,
+    model: str,
+    system_prompt: str,
+    user_prompt: str,
+    started: threading.Event | None = None,
+    cancel: threading.Event | None = None,
+    max_output_tokens: int = MAX_OUTPUT_TOKENS,
+) -> str:
+    """流式请求；收到首段输出或请求结束时 set ``started``，``cancel`` 被 set 时停止读流。返回完整文本。"""
+    print(f"🤖 尝试模型: {model}")
+    _, types = gemini.import_genai()
+    cached_content = _context_cache(client, model, system_prompt)
+    if cached_content:
+        prompt_config = {"cached_content": cached_content}
+    else:
+        prompt_config = {"system_instruction": system_prompt}
+    parts: list[str] = []
+    t0 = time.monotonic()
+    try:
+        for chunk in client.models.generate_content_stream(
+            model=model,
+            contents=user_prompt,
+            config=types.GenerateContentConfig(
+                **prompt_config,
+                temperature=0.7,
+                max_output_tokens=max_output_tokens,
+            ),
+        ):
+            if cancel and cancel.is_set():
+                break
+            if chunk.text:
+                parts.append(chunk.text)
+                if started and not started.is_set():
+                    hedge.record(model, time.monotonic() - t0)
+                    started.set()
+    finally:
+        if started:
+            started.set()
+    return "".join(parts)
+
+
+def _generate_hedged(
+    client: genai.Client,
+    system_prompt: str,
+    user_prompt: str,
+    max_output_tokens: int = MAX_OUTPUT_TOKENS,
+) -> tuple[str, str]:
+    """主模型 + fallback 的 hedged 请求（见 hedge.race），返回最先成功的 (model, text)。"""
+
+    def request(model: str, started: threading.Event | None, cancel: threading.Event) -> str:
+        return _request(client, model, system_prompt, user_prompt, started, cancel, max_output_tokens)
+
+    result = hedge.race(MODEL_PRIMARY, MODEL_FALLBACK, request)
+    if result is None:
+        print("❌ 所有模型都不可用", file=sys.stderr)
+        sys.exit(1)
+    return result
+
+
 def generate_content(
     digest_text: str,
     date_str: str | None = None,
     content_type: str = "brief",
-) -> dict:
-    """调用 Gemini 进行多类型内容生成。"""
+    style_rules: str | None = None,
+    max_output_tokens: int = MAX_OUTPUT_TOKENS,
+) -> dict | None:
+    """调用 Gemini 进行多类型内容生成。
+
+    传入 style_rules（见 de_ai.style_rules_for）时，把去AI味/写作风格规则拼进
+    system prompt，一次调用直接产出终稿；这种模式下 JSON 解析失败（多半是输出
+    被截断）返回 None，由调用方退回“生成 + de-AI”两步。
+    """
     if content_type not in CONTENT_TYPES:
         raise ValueError(f"Unsupported content_type: {content_type}")
 
     if not date_str:
         date_str = datetime.now().strftime("%m.%d")
 
-    client = genai.Client()
     user_prompt = _build_user_prompt(digest_text, date_str, content_type)
     system_prompt = SYSTEM_PROMPTS[content_type]
+    if style_rules:
+        system_prompt = f"{system_prompt}\n\n# 文风要求（直接按以下规则写出终稿 JSON，不会再有改写步骤）\n\n{style_rules}"
 
-    model = MODEL_PRIMARY
-    response = None
-
-    for attempt_model in [MODEL_PRIMARY, MODEL_FALLBACK]:
-        try:
-            print(f"🤖 尝试模型: {attempt_model}")
-            response = client.models.generate_content(
-                model=attempt_model,
-                contents=user_prompt,
-                config=types.GenerateContentConfig(
-                    system_instruction=system_prompt,
-                    temperature=0.7,
-                    max_output_tokens=8192,
-                ),
-            )
-            model = attempt_model
-            break
-        except Exception as e:
-            if "503" in str(e) or "UNAVAILABLE" in str(e):
-                print(f"⚠️ {attempt_model} 不可用 (503)，尝试 fallback...")
-                continue
-            raise
+    cached = response_cache.get(system_prompt, user_prompt, MODEL_PRIMARY)
+    if cached:
+        model, text = cached["model"], cached["text"]
+        print(f"♻️ 命中缓存 ({model})")
     else:
-        print("❌ 所有模型都不可用", file=sys.stderr)
-        sys.exit(1)
-
-    if response is None or not response.text:
-        print("❌ 模型返回为空", file=sys.stderr)
-        sys.exit(1)
+        model, text = _generate_hedged(gemini.client(), system_prompt, user_prompt, max_output_tokens)
+        print(f"✅ 使用模型: {model}")
 
-    print(f"✅ 使用模型: {model}")
-
-    raw = _extract_json(response.text)
+    raw = gemini.extract_json(text)
     try:
         data = json.loads(raw)
     except json.JSONDecodeError as e:
         print(f"❌ JSON解析失败: {e}", file=sys.stderr)
-        print(f"原始输出片段:\n{response.text[:500]}", file=sys.stderr)
+        print(f"原始输出片段:\n{text[:500]}", file=sys.stderr)
+        if style_rules:
+            return None
         sys.exit(1)
 
     _validate_output(data, content_type)
+    if not cached:
+        response_cache.put(system_prompt, user_prompt, MODEL_PRIMARY, {"model": model, "text": text})
 
     if content_type == "brief":
         print(f"✅ 生成 brief 内容: {len(data.get('items', []))} 条卡片")
@@ -227,10 +343,121 @@ def generate_content(
     return data
 
 
-def load_digest(path: str) -> str:
-    """读取 digest 文件。"""
-    with open(path, "r", encoding="utf-8") as f:
-        return f.read()
+def _build_batch_prompt(digests: list[tuple[str, str]], content_type: str) -> str:
+    blocks = "\n\n".join(
+        f"### 素材 {i}（日期：{date_str}）\n---\n{text}\n---" for i, (text, date_str) in enumerate(digests)
+    )
+    return (
+        f"内容类型：{content_type}\n"
+        f"下面有 {len(digests)} 份素材，每份对应一篇独立的帖子，互不混用。\n\n"
+        f"{blocks}\n\n"
+        '输出一个 JSON 对象 {"results": [...]}，results 按素材编号顺序排列，'
+        "每个元素都严格遵循系统提示里的单篇 JSON 格式（日期用该素材自己的日期）。\n"
+        "输出紧凑 JSON（不要缩进和多余空行），确保完整可解析，不要任何解释。"
+    )
+
+
+def generate_content_batch(
+    digests: list[tuple[str, str]],
+    content_type: str = "brief",
+    max_output_tokens: int = MAX_OUTPUT_TOKENS,
+) -> list[dict]:
+    """一次 Gemini 调用为多份素材生成内容。
+
+    digests 为 (素材, 日期 MM.DD) 列表，返回同顺序的内容 dict 列表；
+    max_output_tokens 是单篇的上限，整批按份数放大。
+    """
+    if content_type not in CONTENT_TYPES:
+        raise ValueError(f"Unsupported content_type: {content_type}")
+
+    user_prompt = _build_batch_prompt(digests, content_type)
+    system_prompt = SYSTEM_PROMPTS[content_type]
+
+    cached = response_cache.get(system_prompt, user_prompt, MODEL_PRIMARY)
+    if cached:
+        model, text = cached["model"], cached["text"]
+        print(f"♻️ 命中缓存 ({model})")
+    else:
+        budget = min(max_output_tokens * len(digests), MAX_BATCH_OUTPUT_TOKENS)
+        model, text = _generate_hedged(gemini.client(), system_prompt, user_prompt, budget)
+        print(f"✅ 使用模型: {model}")
+
+    try:
+        results = json.loads(gemini.extract_json(text))["results"]
+    except (json.JSONDecodeError, KeyError, TypeError) as e:
+        print(f"❌ 批量输出解析失败: {e}", file=sys.stderr)
+        print(f"原始输出片段:\n{text[:500]}", file=sys.stderr)
+        sys.exit(1)
+    if not isinstance(results, list) or len(results) != len(digests):
+        print(f"❌ 批量输出数量不符: 期望 {len(digests)} 篇", file=sys.stderr)
+        sys.exit(1)
+
+    for data in results:
+        _validate_output(data, content_type)
+    if not cached:
+        response_cache.put(system_prompt, user_prompt, MODEL_PRIMARY, {"model": model, "text": text})
+
+    print(f"✅ 批量生成 {content_type} 内容: {len(results)} 篇")
+    return results
+
+
+def load_digest(path: str, max_chars: int | None = None) -> str:
+    """读取 digest 文件；指定 max_chars 时最多读取这么多字符。
+
+    按字节一次读入再整体解码，避免文本模式逐块解码、反复扩容。
+    """
+    if max_chars is None:
+        return Path(path).read_bytes().decode("utf-8")
+    with open(path, "rb") as f:
+        # UTF-8 每个字符最多 4 字节；末尾被截断的半个字符由增量解码器丢弃
+        raw = f.read(max_chars * 4)
+    return codecs.getincrementaldecoder("utf-8")().decode(raw)[:max_chars]
+
+
+# [锚文本](链接) → 锚文本；裸链接、行尾空白、连续空行对生成没有帮助，只占输入 token
+_MD_LINK_RE = re.compile(r"\[([^\]]+)\]\([^)\s]+\)")
+_BARE_URL_RE = re.compile(r"<?https?://[\w\-.~:/?#@!$&'*+,;=%]*[\w\-~/#=&%]>?", re.ASCII)
+_TRAILING_WS_RE = re.compile(r"[ \t]+$", re.MULTILINE)
+_BLANK_LINES_RE = re.compile(r"\n\s*\n+")
+
+
+def compress_digest(text: str, max_chars: int = MAX_DIGEST_CHARS) -> str:
+    """发送前精简素材：去掉链接地址和多余空白，超出 max_chars 截断。"""
+    text = _MD_LINK_RE.sub(r"\1", text)
+    text = _BARE_URL_RE.sub("", text)
+    text = _TRAILING_WS_RE.sub("", text)
+    text = _BLANK_LINES_RE.sub("\n\n", text).strip()
+    return text[:max_chars]
+
+
+def _join_capped(parts: list[str], sep: str, limit: int) -> tuple[str, bool]:
+    """等价于 sep.join(parts)[:limit]，但超出预算后不再拼接。返回 (文本, 是否截断)。"""
+    buf = io.StringIO()
+    room = limit
+    for i, part in enumerate(parts):
+        piece = part if i == 0 else sep + part
+        if len(piece) > room:
+            buf.write(piece[:room])
+            return buf.getvalue(), True
+        buf.write(piece)
+        room -= len(piece)
+    return buf.getvalue(), False
+
+
+def _today_summary_paths(yt_dir: str, today: str) -> list[str]:
+    """按频道名、文件名排序，返回 youtube/<channel>/summaries/ 下今天的 .md 路径。"""
+    with os.scandir(yt_dir) as it:
+        channels = sorted(e.name for e in it if e.is_dir())
+
+    paths = []
+    for channel in channels:
+        try:
+            with os.scandir(os.path.join(yt_dir, channel, "summaries")) as it:
+                names = sorted(e.name for e in it if e.name.startswith(today) and e.name.endswith(".md"))
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        paths.extend(os.path.join(yt_dir, channel, "summaries", name) for name in names)
+    return paths
 
 
 def load_latest_digest(workspace: str, source: str = "x") -> tuple[str, str]:
@@ -242,7 +469,7 @@ def load_latest_digest(workspace: str, source: str = "x") -> tuple[str, str]:
     if source in ("x", "both"):
         x_path = os.path.join(workspace, "raw", "x-posts", f"{today}_digest.md")
         if os.path.exists(x_path):
-            texts.append(f"## X/Twitter 巡逻\n\n{load_digest(x_path)}")
+            texts.append(f"## X/Twitter 巡逻\n\n{load_digest(x_path, MAX_DIGEST_CHARS)}")
         else:
             print(f"⚠️ X digest 不存在: {x_path}", file=sys.stderr)
 
@@ -250,24 +477,22 @@ def load_latest_digest(workspace: str, source: str = "x") -> tuple[str, str]:
         yt_dir = os.path.join(workspace, "raw", "youtube")
         if os.path.isdir(yt_dir):
             yt_texts = []
-            for channel in sorted(os.listdir(yt_dir)):
-                sum_dir = os.path.join(yt_dir, channel, "summaries")
-                if not os.path.isdir(sum_dir):
-                    continue
-                for filename in sorted(os.listdir(sum_dir)):
-                    if filename.startswith(today) and filename.endswith(".md"):
-                        yt_texts.append(load_digest(os.path.join(sum_dir, filename)))
+            sum_paths = _today_summary_paths(yt_dir, today)
+            if sum_paths:
+                # 读取是阻塞 I/O（释放 GIL），并发读可以重叠等待
+                with ThreadPoolExecutor(max_workers=min(16, len(sum_paths))) as pool:
+                    yt_texts = list(pool.map(load_digest, sum_paths, [MAX_DIGEST_CHARS] * len(sum_paths)))
             if yt_texts:
-                texts.append("## YouTube 巡逻\n\n" + "\n\n---\n\n".join(yt_texts))
+                yt_body, _ = _join_capped(yt_texts, "\n\n---\n\n", MAX_DIGEST_CHARS)
+                texts.append("## YouTube 巡逻\n\n" + yt_body)
 
     if not texts:
         print("❌ 没有找到今天的巡逻素材", file=sys.stderr)
         sys.exit(1)
 
-    combined = "\n\n".join(texts)
-    if len(combined) > 30000:
-        print(f"⚠️ 素材太长（{len(combined)}字），截断至30000字")
-        combined = combined[:30000]
+    combined, truncated = _join_capped(texts, "\n\n", MAX_DIGEST_CHARS)
+    if truncated:
+        print(f"⚠️ 素材太长，截断至{MAX_DIGEST_CHARS}字")
 
     return combined, date_display
 
@@ -289,10 +514,16 @@ def main() -> None:
     p_auto.add_argument("--type", choices=CONTENT_TYPES, default="brief", help="内容类型")
     p_auto.add_argument("--output", "-o", help="输出 JSON 路径")
 
+    for p in (p_file, p_auto):
+        p.add_argument("--no-cache", action="store_true", help="不读写本地模型输出缓存")
+        p.add_argument("--max-tokens", type=int, default=MAX_OUTPUT_TOKENS, help="输出 token 上限")
+
     args = parser.parse_args()
     if not args.command:
         parser.print_help()
         sys.exit(1)
+    if args.no_cache:
+        response_cache.disable()
 
     if args.command == "from-file":
         digest_text = load_digest(args.input)
@@ -302,14 +533,16 @@ def main() -> None:
         if args.date:
             date_str = args.date
 
-    print(f"📝 素材长度: {len(digest_text)}字")
+    raw_len = len(digest_text)
+    digest_text = compress_digest(digest_text)
+    print(f"📝 素材长度: {len(digest_text)}字（精简前 {raw_len}字）")
     print(f"📅 日期: {date_str}")
     print(f"🧩 类型: {args.type}")
     print(f"🤖 模型: {MODEL_PRIMARY} (fallback: {MODEL_FALLBACK})")
     print("⏳ 调用 Gemini 精修中...\n")
 
-    data = generate_content(digest_text, date_str, content_type=args.type)
-    output_json = json.dumps(data, ensure_ascii=False, indent=2)
+    data = generate_content(digest_text, date_str, content_type=args.type, max_output_tokens=args.max_tokens)
+    output_json = gemini.dumps(data)
 
     if args.output:
         os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
@@ -19,21 +19,31 @@ de_ai.py — 去AI味模块
   $VENV de_ai.py --list-styles
 """
 
+from __future__ import annotations
+
 import argparse
+import functools
 import json
 import os
+import random
+import re
 import sys
+import threading
+import time
 from pathlib import Path
+from typing import TYPE_CHECKING
+
+import gemini
+import hedge
+import response_cache
 
-try:
+if TYPE_CHECKING:
     from google import genai
-    from google.genai import types
-except ImportError:
-    print("❌ 需要 google-genai: pip install google-genai", file=sys.stderr)
-    sys.exit(1)
 
 MODEL_PRIMARY = os.environ.get("DEAI_MODEL", "gemini-3.1-pro-preview")
 MODEL_FALLBACK = "gemini-3-flash-preview"
+# 429 限流时先退避重试主模型，超过次数才交给 fallback
+RATE_LIMIT_ATTEMPTS = 3
 
 SCRIPT_DIR = Path(__file__).parent
 STYLES_PATH = SCRIPT_DIR.parent.parent.parent.parent / ".openclaw" / "workspace-rednote-ops" / "knowledge" / "styles" / "writing-styles.json"
@@ -45,23 +55,35 @@ STYLES_PATH_ALT = Path(os.path.expanduser("~/.openclaw/workspace-rednote-ops/kno
 # 写作风格加载
 # ═══════════════════════════════════════════════════════════════
 
+@functools.lru_cache(maxsize=1)
 def load_writing_styles() -> dict:
-    """加载写作风格库。"""
+    """加载写作风格库（进程内只读一次，调用方不要修改返回值）。"""
     for p in [STYLES_PATH, STYLES_PATH_ALT]:
         if p.exists():
             return json.loads(p.read_text(encoding="utf-8"))
     return {"styles": []}
 
 
+@functools.lru_cache(maxsize=1)
+def _style_index() -> dict[str, dict]:
+    """id / name → 风格；同一个键取列表里最先出现的风格。"""
+    index: dict[str, dict] = {}
+    for s in load_writing_styles().get("styles", []):
+        index.setdefault(s["id"], s)
+        if "name" in s:
+            index.setdefault(s["name"], s)
+    return index
+
+
+@functools.lru_cache(maxsize=64)
 def get_style_prompt(style_id: str | None) -> str:
     """获取指定风格的 prompt 片段。如果未指定或找不到，返回默认。"""
     if not style_id:
         return _DEFAULT_STYLE_PROMPT
 
-    lib = load_writing_styles()
-    for s in lib.get("styles", []):
-        if s["id"] == style_id or s.get("name") == style_id:
-            return s.get("prompt", _DEFAULT_STYLE_PROMPT)
+    s = _style_index().get(style_id)
+    if s is not None:
+        return s.get("prompt", _DEFAULT_STYLE_PROMPT)
 
     print(f"⚠️ 未找到写作风格 '{style_id}'，使用默认风格", file=sys.stderr)
     return _DEFAULT_STYLE_PROMPT
@@ -121,10 +143,8 @@ LOCALIZATION_RULES = """
 # System Prompt
 # ═══════════════════════════════════════════════════════════════
 
-def build_system_prompt(style_prompt: str) -> str:
-    return f"""你是一个小红书文案改写专家。你的任务是把AI生成的文案改写成真人写的、口语化的、接地气的风格。
-
-## 核心原则
+# system prompt 里与风格无关的前后两段，模块加载时拼好
+_REWRITE_RULES = """## 核心原则
 1. **去掉一切AI味** — 不要"首先/其次/最后"，不要"值得注意的是"，不要"总的来说"，不要"在当今xxx背景下"
 2. **去掉一切官腔** — 不要"赋能""矩阵""生态""抓手""颗粒度""底层逻辑"
 3. **去掉一切空话** — 每句话必须有信息量，删掉所有废话和过渡句
@@ -137,145 +157,241 @@ def build_system_prompt(style_prompt: str) -> str:
 - 用数据、案例、逻辑说话，而不是"我的亲身经历"
 - 如果原文本身就是第一人称日记体（比如"搞钱日记"风格），可以适度保留，但也不要每段都"我我我"
 
-{style_prompt}
+"""
 
-{LOCALIZATION_RULES}
+_PROMPT_HEAD = "你是一个小红书文案改写专家。你的任务是把AI生成的文案改写成真人写的、口语化的、接地气的风格。\n\n" + _REWRITE_RULES
+
+_PROMPT_TAIL = "\n\n" + LOCALIZATION_RULES + """
 
 ## 输出要求
-- 如果输入是 JSON，输出也必须是 JSON，只改 post_body、post_title、cover_title 三个字段
+- 如果输入是 <<<字段名>>> … <<<END>>> 分段格式，按同样的分段格式输出，只改 post_body、post_title、cover_title 三个字段
 - 如果输入是纯文本，输出改写后的纯文本
 - post_title 改写后仍然 ≤ 20字
 - post_body 改写后仍然 600-950字
 - **严格输出改写结果，不要输出解释或评论**"""
 
 
+def build_system_prompt(style_prompt: str) -> str:
+    return _PROMPT_HEAD + style_prompt + _PROMPT_TAIL
+
+
+@functools.lru_cache(maxsize=32)
+def _system_prompt_for(style_id: str | None) -> str:
+    """按写作风格缓存完整 system prompt。"""
+    return build_system_prompt(get_style_prompt(style_id))
+
+
+@functools.lru_cache(maxsize=32)
+def style_rules_for(style_id: str | None) -> str:
+    """去AI味规则 + 写作风格 + 本土化规则（不含角色和输出格式），供生成阶段直接拼进 prompt。"""
+    return _REWRITE_RULES + get_style_prompt(style_id) + "\n\n" + LOCALIZATION_RULES
+
+
 # ═══════════════════════════════════════════════════════════════
 # Gemini 调用
 # ═══════════════════════════════════════════════════════════════
 
-def call_gemini(system_prompt: str, user_prompt: str) -> str | None:
-    """调用 Gemini 进行去AI味改写。"""
-    client = genai.Client()
-
-    for model in [MODEL_PRIMARY, MODEL_FALLBACK]:
+def _generate(
+    client: genai.Client,
+    model: str,
+    system_prompt: str,
+    user_prompt: str,
+    started: threading.Event | None = None,
+    cancel: threading.Event | None = None,
+) -> str | None:
+    """流式请求一个模型；收到第一段输出（或请求结束）时 set ``started``，``cancel`` 被 set 时停止读流。"""
+    print(f"  🤖 de-AI模型: {model}", file=sys.stderr)
+    _, types = gemini.import_genai()
+    parts: list[str] = []
+    t0 = time.monotonic()
+    try:
+        for chunk in client.models.generate_content_stream(
+            model=model,
+            contents=user_prompt,
+            config=types.GenerateContentConfig(
+                system_instruction=system_prompt,
+                temperature=0.8,  # 稍高温度，鼓励更自然的表达
+                max_output_tokens=8192,
+            ),
+        ):
+            if cancel and cancel.is_set():
+                break
+            if chunk.text:
+                parts.append(chunk.text)
+                if started and not started.is_set():
+                    hedge.record(model, time.monotonic() - t0)
+                    started.set()
+    finally:
+        if started:
+            started.set()
+    return "".join(parts) or None
+
+
+def _is_rate_limited(e: Exception) -> bool:
+    msg = str(e)
+    return "429" in msg or "RESOURCE_EXHAUSTED" in msg
+
+
+def _generate_with_backoff(
+    client: genai.Client,
+    model: str,
+    system_prompt: str,
+    user_prompt: str,
+    started: threading.Event | None = None,
+    cancel: threading.Event | None = None,
+) -> str | None:
+    """同 ``_generate``，遇到 429 指数退避（带抖动）重试，最多 RATE_LIMIT_ATTEMPTS 次。"""
+    for attempt in range(RATE_LIMIT_ATTEMPTS):
         try:
-            print(f"  🤖 de-AI模型: {model}", file=sys.stderr)
-            response = client.models.generate_content(
-                model=model,
-                contents=user_prompt,
-                config=types.GenerateContentConfig(
-                    system_instruction=system_prompt,
-                    temperature=0.8,  # 稍高温度，鼓励更自然的表达
-                    max_output_tokens=8192,
-                ),
-            )
-            if response and response.text:
-                print(f"  ✅ de-AI完成 ({model})", file=sys.stderr)
-                return response.text
+            return _generate(client, model, system_prompt, user_prompt, started, cancel)
         except Exception as e:
-            if any(k in str(e) for k in ["503", "UNAVAILABLE", "429", "RESOURCE_EXHAUSTED"]):
-                print(f"  ⚠️ {model} 不可用: {e}", file=sys.stderr)
-                continue
-            print(f"  ❌ {model} 错误: {e}", file=sys.stderr)
-            continue
+            if not _is_rate_limited(e) or attempt == RATE_LIMIT_ATTEMPTS - 1 or (cancel and cancel.is_set()):
+                raise
+            backoff = min(2 ** attempt + random.random(), 30)
+            print(f"  ⏳ {model} 限流，{backoff:.1f}s 后重试", file=sys.stderr)
+            time.sleep(backoff)
+    return None
+
+
+def call_gemini(system_prompt: str, user_prompt: str) -> str | None:
+    """调用 Gemini 进行去AI味改写。
+
+    主模型与 fallback 的 hedged 请求见 hedge.race；
+    429 限流先在主模型上退避重试，不直接降级。
+    成功结果缓存在本地磁盘，哪些结果会缓存见 response_cache.put。
+    """
+    cached = response_cache.get(system_prompt, user_prompt, MODEL_PRIMARY)
+    if cached:
+        print(f"  ♻️ de-AI命中缓存 ({cached['model']})", file=sys.stderr)
+        return cached["text"]
+
+    client = gemini.client()
+
+    def request(model: str, started: threading.Event | None, cancel: threading.Event) -> str | None:
+        generate = _generate_with_backoff if model == MODEL_PRIMARY else _generate
+        return generate(client, model, system_prompt, user_prompt, started, cancel)
+
+    result = hedge.race(MODEL_PRIMARY, MODEL_FALLBACK, request)
+    if result is not None:
+        model, text = result
+        print(f"  ✅ de-AI完成 ({model})", file=sys.stderr)
+        response_cache.put(system_prompt, user_prompt, MODEL_PRIMARY, {"model": model, "text": text})
+        return text
 
     print("❌ 所有模型都不可用", file=sys.stderr)
     return None
 
 
-def _extract_json(text: str) -> str:
-    """从 Gemini 输出中提取 JSON。"""
-    raw = text.strip()
-    if "```json" in raw:
-        raw = raw.split("```json", 1)[1]
-        raw = raw.split("```", 1)[0]
-    elif "```" in raw:
-        raw = raw.split("```", 1)[1]
-        raw = raw.split("```", 1)[0]
-    return raw.strip()
+# 一个 JSON 字符串字面量（允许结尾未闭合，LLM 输出可能被截断）
+_JSON_STRING_RE = re.compile(r'"(?:\\.|[^"\\])*"?', re.DOTALL)
+# 字符串内部：转义序列原样保留，只替换裸换行
+_ESCAPE_OR_NEWLINE_RE = re.compile(r"\\.|\n", re.DOTALL)
+
+
+def _escape_newlines(m: re.Match) -> str:
+    literal = m.group(0)
+    if "\n" not in literal:
+        return literal
+    return _ESCAPE_OR_NEWLINE_RE.sub(lambda e: "\\n" if e.group(0) == "\n" else e.group(0), literal)
 
 
 def _fix_json_newlines(raw: str) -> str:
     """修复 JSON string value 中的真实换行。"""
-    result = []
-    in_string = False
-    i = 0
-    while i < len(raw):
-        ch = raw[i]
-        if ch == '\\' and in_string and i + 1 < len(raw):
-            result.append(ch)
-            result.append(raw[i + 1])
-            i += 2
-            continue
-        if ch == '"':
-            in_string = not in_string
-            result.append(ch)
-        elif ch == '\n' and in_string:
-            result.append('\\n')
-        else:
-            result.append(ch)
-        i += 1
-    return ''.join(result)
+    return _JSON_STRING_RE.sub(_escape_newlines, raw)
 
 
 # ═══════════════════════════════════════════════════════════════
 # 主逻辑
 # ═══════════════════════════════════════════════════════════════
 
-def de_ai_content_json(content: dict, style_id: str | None = None) -> dict:
-    """对 content.json 进行去AI味改写。"""
-    style_prompt = get_style_prompt(style_id)
-    system_prompt = build_system_prompt(style_prompt)
-
-    # 提取需要改写的字段
-    fields_to_rewrite = {
-        "post_title": content.get("post_title", ""),
-        "post_body": content.get("post_body", ""),
-        "cover_title": content.get("cover_title", ""),
+_REWRITE_FIELDS = ("post_title", "post_body", "cover_title")
+_FIELD_BLOCK_RE = re.compile(r"<<<(\w+)>>>\n(.*?)\n?<<<END>>>", re.DOTALL)
+
+
+def _parse_rewrite(raw: str) -> dict | None:
+    """解析分段格式的改写结果；模型仍按 JSON 回复时退回 JSON 解析。"""
+    rewritten = {
+        name.lower(): value.strip()
+        for name, value in _FIELD_BLOCK_RE.findall(raw)
+        if name.lower() in _REWRITE_FIELDS
     }
+    if rewritten:
+        return rewritten
+
+    json_str = gemini.extract_json(raw)
+    try:
+        return json.loads(json_str)
+    except json.JSONDecodeError:
+        fixed = _fix_json_newlines(json_str)
+        try:
+            return json.loads(fixed)
+        except json.JSONDecodeError as e:
+            print(f"❌ de-AI 输出解析失败: {e}", file=sys.stderr)
+            return None
+
+
+def _log(lines: list[str]) -> None:
+    """一次写出多行日志到 stderr（单次 write + flush）。"""
+    if lines:
+        sys.stderr.write("\n".join(lines) + "\n")
+        sys.stderr.flush()
+
+
+# 正文里已经有这些口头禅、且长度达标，说明已经是改写过/手改过的稿子
+_HUMAN_MARKERS = ("说白了", "讲真", "你想想", "举个栗子")
+
 
-    user_prompt = f"""请改写以下小红书帖子的三个文本字段。只输出 JSON，包含改写后的 post_title、post_body、cover_title。
+def _looks_human(body: str) -> bool:
+    return len(body) <= 950 and any(m in body for m in _HUMAN_MARKERS)
+
+
+def de_ai_content_json(content: dict, style_id: str | None = None) -> dict:
+    """对 content.json 进行去AI味改写。已经口语化的稿子直接原样返回，不调用模型。"""
+    if _looks_human(content.get("post_body", "")):
+        _log(["  ⏭️ 正文已口语化，跳过 de-AI"])
+        return content
+
+    system_prompt = _system_prompt_for(style_id)
+
+    # 字段以纯文本分段发送，避免对长正文做 JSON 转义/反转义
+    blocks = "\n".join(
+        f"<<<{field.upper()}>>>\n{content.get(field, '')}\n<<<END>>>" for field in _REWRITE_FIELDS
+    )
+
+    user_prompt = f"""请改写以下小红书帖子的三个文本字段。按相同的分段格式输出改写后的 POST_TITLE、POST_BODY、COVER_TITLE。
 
 原始内容：
-```json
-{json.dumps(fields_to_rewrite, ensure_ascii=False, indent=2)}
-```
+{blocks}
 
 要求：
 1. post_title 改写后 ≤ 20字
 2. post_body 改写后 600-950字
-3. cover_title 保持 \\n 换行格式，每行 ≤ 12字
-4. 只输出 JSON，不要其他文字"""
+3. cover_title 保持原有换行，每行 ≤ 12字
+4. 每段以 <<<字段名>>> 开头、<<<END>>> 结尾，只输出这三段，不要其他文字"""
 
     raw = call_gemini(system_prompt, user_prompt)
     if not raw:
         print("❌ de-AI 改写失败", file=sys.stderr)
         return content
 
-    json_str = _extract_json(raw)
-    try:
-        rewritten = json.loads(json_str)
-    except json.JSONDecodeError:
-        fixed = _fix_json_newlines(json_str)
-        try:
-            rewritten = json.loads(fixed)
-        except json.JSONDecodeError as e:
-            print(f"❌ de-AI JSON解析失败: {e}", file=sys.stderr)
-            return content
+    rewritten = _parse_rewrite(raw)
+    if rewritten is None:
+        return content
 
-    # 合并改写结果
+    # 合并改写结果，期间的提示攒起来最后一次输出
     result = content.copy()
+    logs: list[str] = []
     if "post_title" in rewritten:
         new_title = rewritten["post_title"]
         if len(new_title) <= 20:
             result["post_title"] = new_title
         else:
-            print(f"  ⚠️ de-AI标题过长({len(new_title)}字)，保留原标题", file=sys.stderr)
+            logs.append(f"  ⚠️ de-AI标题过长({len(new_title)}字)，保留原标题")
 
     if "post_body" in rewritten:
         new_body = rewritten["post_body"]
         if len(new_body) < 300:
-            print(f"  ⚠️ de-AI正文过短({len(new_body)}字)，保留原正文", file=sys.stderr)
+            logs.append(f"  ⚠️ de-AI正文过短({len(new_body)}字)，保留原正文")
         else:
             # 超950字时截断到最后一个完整段落
             if len(new_body) > 950:
@@ -285,19 +401,19 @@ def de_ai_content_json(content: dict, style_id: str | None = None) -> dict:
                     new_body = cut[:last_nl].rstrip()
                 else:
                     new_body = cut.rstrip()
-                print(f"  🔧 正文截断: {len(rewritten['post_body'])}→{len(new_body)}字", file=sys.stderr)
+                logs.append(f"  🔧 正文截断: {len(rewritten['post_body'])}→{len(new_body)}字")
             result["post_body"] = new_body
 
     if "cover_title" in rewritten:
         result["cover_title"] = rewritten["cover_title"]
 
+    _log(logs)
     return result
 
 
 def de_ai_text(text: str, style_id: str | None = None) -> str:
     """对纯文本进行去AI味改写。"""
-    style_prompt = get_style_prompt(style_id)
-    system_prompt = build_system_prompt(style_prompt)
+    system_prompt = _system_prompt_for(style_id)
 
     user_prompt = f"""请改写以下小红书正文，去掉AI味，变得口语化接地气。只输出改写后的正文，不要其他文字。
 
@@ -320,8 +436,11 @@ def main():
     parser.add_argument("--text-only", action="store_true", help="纯文本模式（从stdin读取）")
     parser.add_argument("--list-styles", action="store_true", help="列出可用写作风格")
     parser.add_argument("--dry-run", action="store_true", help="只输出不保存")
+    parser.add_argument("--no-cache", action="store_true", help="不读写本地模型输出缓存")
 
     args = parser.parse_args()
+    if args.no_cache:
+        response_cache.disable()
 
     if args.list_styles:
         lib = load_writing_styles()
@@ -348,18 +467,19 @@ def main():
     with open(args.input, "r", encoding="utf-8") as f:
         content = json.load(f)
 
-    print(f"📝 原始标题: {content.get('post_title', '?')}", file=sys.stderr)
-    print(f"📝 原始正文: {len(content.get('post_body', ''))}字", file=sys.stderr)
-    print(f"🎨 写作风格: {args.writing_style or '默认'}", file=sys.stderr)
+    _log([
+        f"📝 原始标题: {content.get('post_title', '?')}",
+        f"📝 原始正文: {len(content.get('post_body', ''))}字",
+        f"🎨 写作风格: {args.writing_style or '默认'}",
+    ])
 
     result = de_ai_content_json(content, style_id=args.writing_style)
 
     new_title = result.get("post_title", "")
     new_body = result.get("post_body", "")
-    print(f"\n✅ 改写标题: {new_title} ({len(new_title)}字)", file=sys.stderr)
-    print(f"✅ 改写正文: {len(new_body)}字", file=sys.stderr)
+    _log([f"\n✅ 改写标题: {new_title} ({len(new_title)}字)", f"✅ 改写正文: {len(new_body)}字"])
 
-    output_json = json.dumps(result, ensure_ascii=False, indent=2)
+    output_json = gemini.dumps(result)
 
     if args.dry_run:
         print(output_json)
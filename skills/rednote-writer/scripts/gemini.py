@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""content_gen 和 de_ai 共用的 Gemini 辅助函数。
+
+同一进程里只导入一次 google-genai、只建一个 client（共享连接池和鉴权）。
+"""
+
+from __future__ import annotations
+
+import functools
+import json
+import re
+import sys
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from google import genai as _genai
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+
+@functools.lru_cache(maxsize=1)
+def import_genai():
+    """延迟导入 google-genai：--help 等不调用模型的路径不必付出导入开销。"""
+    try:
+        from google import genai
+        from google.genai import types
+    except ImportError:
+        print("❌ 需要 google-genai: pip install google-genai", file=sys.stderr)
+        sys.exit(1)
+    return genai, types
+
+
+@functools.lru_cache(maxsize=1)
+def client() -> _genai.Client:
+    """进程内复用同一个 Gemini client（连接池 + 鉴权只初始化一次）。"""
+    genai, _ = import_genai()
+    return genai.Client()
+
+
+# ```json 围栏优先，其次任意 ``` 围栏；未闭合时取到结尾
+_JSON_FENCE_RE = re.compile(r"```json(.*?)(?:```|\Z)", re.DOTALL)
+_FENCE_RE = re.compile(r"```(.*?)(?:```|\Z)", re.DOTALL)
+
+
+def extract_json(text: str) -> str:
+    """从 Gemini 输出中提取 JSON。"""
+    m = _JSON_FENCE_RE.search(text) or _FENCE_RE.search(text)
+    return (m.group(1) if m else text).strip()
+
+
+def dumps(data: dict) -> str:
+    """序列化为带缩进的 JSON；装了 orjson 就用 orjson。"""
+    if HAS_ORJSON:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2).decode("utf-8")
+    return json.dumps(data, ensure_ascii=False, indent=2)
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""hedged request 的等待时间。
+
+主模型开始输出前要先"思考"，首段输出延迟（time-to-first-chunk）常常超过几秒；
+固定 3 秒的 hedge 几乎每次都会触发 fallback，API 花费接近翻倍。这里记录主模型
+每次实测的首段延迟，hedge 等待时间取最近样本的 P90 再留余量：只有明显慢于平时
+的请求才会并行发 fallback。
+
+样本存在 response_cache.CACHE_DIR/ttfc.json（按模型分开）；
+REDNOTE_HEDGE_DELAY=秒数 可固定等待时间，不看样本。
+
+race() 是 content_gen 和 de_ai 共用的 hedge 流程。
+"""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import os
+import sys
+import threading
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+
+import response_cache
+from fileutil import atomic_write_text
+
+# 样本不足时的默认等待：pro 模型带思考时首段输出通常在 5~15 秒
+DEFAULT_DELAY = 15.0
+MIN_DELAY = 5.0
+MAX_DELAY = 60.0
+# P90 之上再留的余量
+MARGIN = 1.25
+MIN_SAMPLES = 5
+MAX_SAMPLES = 50
+
+SAMPLES_PATH = response_cache.CACHE_DIR / "ttfc.json"
+_lock = threading.Lock()
+
+
+def _load() -> dict[str, list[float]]:
+    try:
+        data = json.loads(SAMPLES_PATH.read_bytes())
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def delay(model: str) -> float:
+    """主模型多久没开始输出就并行请求 fallback（秒）。"""
+    override = os.environ.get("REDNOTE_HEDGE_DELAY", "")
+    if override:
+        return float(override)
+    samples = _load().get(model) or []
+    if len(samples) < MIN_SAMPLES:
+        return DEFAULT_DELAY
+    ordered = sorted(samples)
+    p90 = ordered[int(0.9 * (len(ordered) - 1))]
+    return min(max(p90 * MARGIN, MIN_DELAY), MAX_DELAY)
+
+
+def record(model: str, seconds: float) -> None:
+    """记录一次首段输出延迟；只保留最近 MAX_SAMPLES 个，写失败不影响主流程。"""
+    with _lock:
+        data = _load()
+        samples = data.get(model) or []
+        samples.append(round(seconds, 3))
+        data[model] = samples[-MAX_SAMPLES:]
+        with contextlib.suppress(OSError):
+            atomic_write_text(SAMPLES_PATH, json.dumps(data))
+
+
+# request(model, started, cancel)：started 不为 None 时收到首段输出就 set；
+# cancel 被 set 后应尽快停止读流并返回
+Request = Callable[[str, "threading.Event | None", threading.Event], "str | None"]
+
+
+def _start(request: Request, model: str, started: threading.Event | None, cancel: threading.Event) -> Future:
+    """在 daemon 线程里跑请求：进程退出时不等落败的请求读完流。"""
+    future: Future = Future()
+
+    def run() -> None:
+        future.set_running_or_notify_cancel()
+        try:
+            future.set_result(request(model, started, cancel))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name=f"hedge-{model}", daemon=True).start()
+    return future
+
+
+def race(primary: str, fallback: str, request: Request) -> tuple[str, str] | None:
+    """主模型 delay() 秒内没开始输出就并行请求 fallback，返回最先成功的 (model, text)。
+
+    任一请求失败（异常或空输出）都继续等另一个；主模型失败而 fallback 还没发时立即补发。
+    两个都失败才返回 None。返回前 set 落败请求的 cancel，让它停止读流。
+    """
+    cancel = threading.Event()
+    started = threading.Event()
+    pending = {_start(request, primary, started, cancel): primary}
+    hedged = not started.wait(delay(primary))
+    if hedged:
+        pending[_start(request, fallback, None, cancel)] = fallback
+
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            model = pending.pop(future)
+            try:
+                text = future.result()
+            except Exception as e:
+                print(f"  ⚠️ {model} 请求失败: {e}", file=sys.stderr)
+                continue
+            if text:
+                cancel.set()
+                return model, text
+            print(f"  ⚠️ {model} 返回为空", file=sys.stderr)
+        if not hedged and not pending:
+            hedged = True
+            pending[_start(request, fallback, None, cancel)] = fallback
+    return None
@@ -2,12 +2,23 @@
 """小红书 Writer 主流程（仅写作与制图，不负责发布）。"""
 
 import argparse
+import functools
+import hashlib
 import json
 import os
 import re
 import shutil
 import sys
-from datetime import datetime
+import tempfile
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+
+# orjson 可选：有则用它序列化 content.json / meta.json，输出与标准库一致（见 tests/test_rednote_writer.py）
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
 
 # 路径常量
 WORKSPACE = os.path.expanduser("~/.openclaw/workspace")
@@ -19,36 +30,75 @@ ICLOUD_DIR = os.path.expanduser(
 STYLE_CHOICES = ["typography-card", "notes-app", "text-only"]
 TYPE_CHOICES = ["brief", "analysis", "opinion", "tools"]
 
+# iCloud 目标目录里记录上次同步快照的文件
+SYNC_MANIFEST = ".sync_manifest"
+# 不超过这个大小的文件按内容哈希判断是否变化（文案、meta、卡片 PNG 都在此之内）
+HASH_MAX_BYTES = 8 * 1024 * 1024
+
+# content.txt 分隔线
+SEP = "=" * 50
+
+# iCloud 同步在后台线程做，pipeline 不必等待；main() 返回前用 wait_for_sync() 等同步完成
+# （不能靠 atexit：解释器开始退出后，同步里再开线程池会失败）
+_SYNC_POOL = ThreadPoolExecutor(max_workers=1, thread_name_prefix="icloud-sync")
+_pending_syncs: list[Future] = []
+
 # 导入兄弟模块
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, SCRIPT_DIR)
 
-from content_gen import generate_content, load_digest, load_latest_digest
-from card_gen import generate_cards
-from de_ai import de_ai_content_json
+from content_gen import (
+    MAX_OUTPUT_TOKENS,
+    generate_content,
+    compress_digest,
+    generate_content_batch,
+    load_digest,
+    load_latest_digest,
+)
+# card_gen（多进程渲染）和 de_ai 在用到的函数里再导入，--help 等路径不必加载
+import response_cache
+import semantic_cache
+from fileutil import atomic_write_bytes, atomic_write_text  # 原子写入：中途中断不会留下半截文件被 iCloud 同步走
+
 
+_SLUG_SEP_RE = re.compile(r"[\s_/|]+")
+_SLUG_DROP_RE = re.compile(r"[^a-z0-9\u4e00-\u9fff\-]")
+_SLUG_DASHES_RE = re.compile(r"-+")
+_ISO_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+_MONTH_DAY_RE = re.compile(r"^(\d{2})[.\-/](\d{2})$")
+_ISO_DATE_PREFIX_RE = re.compile(r"^(\d{4})-(\d{2})-(\d{2})")
 
+
+@functools.lru_cache(maxsize=256)
 def slugify(text: str) -> str:
     raw = (text or "").strip().lower()
-    raw = re.sub(r"[\s_/|]+", "-", raw)
-    raw = re.sub(r"[^a-z0-9\u4e00-\u9fff\-]", "", raw)
-    raw = re.sub(r"-+", "-", raw).strip("-")
+    raw = _SLUG_SEP_RE.sub("-", raw)
+    raw = _SLUG_DROP_RE.sub("", raw)
+    raw = _SLUG_DASHES_RE.sub("-", raw).strip("-")
     return raw or "untitled"
 
 
-def resolve_date_for_dir(date_str: str | None = None) -> str:
+def resolve_date_for_dir(date_str: str | None = None, *, now: datetime | None = None) -> str:
+    now = now or datetime.now()
     if not date_str:
-        return datetime.now().strftime("%Y-%m-%d")
+        return now.strftime("%Y-%m-%d")
 
     s = date_str.strip()
-    if re.match(r"^\d{4}-\d{2}-\d{2}$", s):
+    if _ISO_DATE_RE.match(s):
         return s
 
-    m = re.match(r"^(\d{2})[.\-/](\d{2})$", s)
+    m = _MONTH_DAY_RE.match(s)
     if m:
-        return f"{datetime.now().year}-{m.group(1)}-{m.group(2)}"
+        # 只有 MM.DD 时补年份：比今天晚一周以上的日期当成去年的（1 月补做 12 月的草稿）
+        year = now.year
+        try:
+            if datetime(year, int(m.group(1)), int(m.group(2))) - now > timedelta(days=7):
+                year -= 1
+        except ValueError:
+            pass
+        return f"{year}-{m.group(1)}-{m.group(2)}"
 
-    return datetime.now().strftime("%Y-%m-%d")
+    return now.strftime("%Y-%m-%d")
 
 
 def get_title_for_dir(data: dict) -> str:
@@ -60,100 +110,341 @@ def get_title_for_dir(data: dict) -> str:
     )
 
 
-def make_output_dir(title: str, date_str: str | None = None) -> str:
-    date_part = resolve_date_for_dir(date_str)
+def make_output_dir(title: str, date_str: str | None = None, *, now: datetime | None = None) -> str:
+    date_part = resolve_date_for_dir(date_str, now=now)
     dir_name = f"{date_part}_{slugify(title)}"
     out_dir = os.path.join(DRAFTS_DIR, dir_name)
     os.makedirs(out_dir, exist_ok=True)
     return out_dir
 
 
-def save_content_files(out_dir: str, data: dict) -> tuple[str, str]:
-    """保存内容元数据（content.json + content.txt）。"""
-    json_path = os.path.join(out_dir, "content.json")
-    with open(json_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+def dump_json(obj) -> bytes:
+    """缩进 2 格、不转义中文的 UTF-8 JSON。"""
+    if HAS_ORJSON:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
 
-    txt_path = os.path.join(out_dir, "content.txt")
-    with open(txt_path, "w", encoding="utf-8") as f:
-        f.write(f"标题: {get_title_for_dir(data)}\n")
-        if data.get("cover_title") or data.get("cover_subtitle"):
-            f.write(f"封面: {data.get('cover_title', '')} | {data.get('cover_subtitle', '')}\n")
-        if data.get("post_title"):
-            f.write(f"帖子标题: {data.get('post_title')}\n")
-        if data.get("tags"):
-            f.write(f"Tags: {', '.join(data.get('tags', []))}\n")
-
-        f.write(f"\n{'=' * 50}\n正文:\n{'=' * 50}\n\n")
-        if data.get("post_body"):
-            f.write(data.get("post_body", ""))
-        elif data.get("body"):
-            f.write(data.get("body", ""))
-
-        items = data.get("items") or []
-        sections = data.get("sections") or []
-        tools = data.get("tools") or []
-
-        if items:
-            f.write(f"\n\n{'=' * 50}\n卡片项:\n{'=' * 50}\n\n")
-            for i, item in enumerate(items, 1):
-                f.write(f"[{i}] {item.get('title', '')}\n")
-                f.write(f"{item.get('body', '')}\n\n")
-
-        if sections:
-            f.write(f"\n\n{'=' * 50}\n章节:\n{'=' * 50}\n\n")
-            for i, sec in enumerate(sections, 1):
-                f.write(f"[{i}] {sec.get('heading', '')}\n")
-                for point in sec.get("points", []):
-                    f.write(f"- {point}\n")
-                if sec.get("quote"):
-                    f.write(f"  金句: {sec.get('quote')}\n")
-                f.write("\n")
-
-        if tools:
-            f.write(f"\n\n{'=' * 50}\n工具:\n{'=' * 50}\n\n")
-            for i, tool in enumerate(tools, 1):
-                f.write(f"[{i}] {tool.get('name', '')}\n")
-                if tool.get("description"):
-                    f.write(f"  说明: {tool.get('description')}\n")
-                if tool.get("verdict"):
-                    f.write(f"  结论: {tool.get('verdict')}\n")
-                f.write("\n")
 
+# content.txt 里的列表区块：(字段, 区块标题, 条目标题字段, ((子字段, 行前缀, 为空也输出), ...))
+# 子字段是列表时每个元素一行；新增内容类型只需在这里加一行
+_TXT_LIST_SECTIONS = (
+    ("items", "卡片项", "title", (("body", "", True),)),
+    ("sections", "章节", "heading", (("points", "- ", False), ("quote", "  金句: ", False))),
+    ("tools", "工具", "name", (("description", "  说明: ", False), ("verdict", "  结论: ", False))),
+)
+
+
+def save_content_files(out_dir: str, data: dict) -> tuple[str, str]:
+    """保存内容元数据（content.json + content.txt）。"""
+    json_path, txt_path = save_content_json(out_dir, data), save_content_txt(out_dir, data)
     print(f"💾 内容JSON: {json_path}")
     print(f"💾 内容文本: {txt_path}")
     return json_path, txt_path
 
 
+def save_content_json(out_dir: str, data: dict) -> str:
+    json_path = os.path.join(out_dir, "content.json")
+    atomic_write_bytes(json_path, dump_json(data))
+    return json_path
+
+
+def save_content_txt(out_dir: str, data: dict) -> str:
+    """content.txt 只用文案字段（不含 card_paths），可以在渲染卡片时提前写。"""
+    # 先拼好全部片段，最后一次写入
+    parts = [f"标题: {get_title_for_dir(data)}\n"]
+    if data.get("cover_title") or data.get("cover_subtitle"):
+        parts.append(f"封面: {data.get('cover_title', '')} | {data.get('cover_subtitle', '')}\n")
+    if data.get("post_title"):
+        parts.append(f"帖子标题: {data.get('post_title')}\n")
+    if data.get("tags"):
+        parts.append(f"Tags: {', '.join(data.get('tags', []))}\n")
+
+    parts.append(f"\n{SEP}\n正文:\n{SEP}\n\n")
+    if data.get("post_body"):
+        parts.append(data.get("post_body", ""))
+    elif data.get("body"):
+        parts.append(data.get("body", ""))
+
+    for key, heading, title_field, fields in _TXT_LIST_SECTIONS:
+        entries = data.get(key) or []
+        if not entries:
+            continue
+        parts.append(f"\n\n{SEP}\n{heading}:\n{SEP}\n\n")
+        for i, entry in enumerate(entries, 1):
+            parts.append(f"[{i}] {entry.get(title_field, '')}\n")
+            for field, prefix, always in fields:
+                value = entry.get(field, "")
+                if isinstance(value, list):
+                    parts.extend(f"{prefix}{v}\n" for v in value)
+                elif value or always:
+                    parts.append(f"{prefix}{value}\n")
+            parts.append("\n")
+
+    txt_path = os.path.join(out_dir, "content.txt")
+    atomic_write_text(txt_path, "".join(parts))
+    return txt_path
+
+
 def save_meta(
     out_dir: str,
     style_id: str,
     content_type: str,
     card_count: int,
+    now: datetime | None = None,
+    source_key: str | None = None,
 ) -> str:
     meta = {
         "style_id": style_id,
         "content_type": content_type,
-        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "created_at": (now or datetime.now()).isoformat(timespec="seconds"),
         "card_count": card_count,
     }
+    if source_key:
+        meta["source_key"] = source_key
     meta_path = os.path.join(out_dir, "meta.json")
-    with open(meta_path, "w", encoding="utf-8") as f:
-        json.dump(meta, f, ensure_ascii=False, indent=2)
-    print(f"💾 元信息: {meta_path}")
+    atomic_write_bytes(meta_path, dump_json(meta))
     return meta_path
 
 
+def _fingerprint(path: str, st: os.stat_result) -> str:
+    """小文件取内容 sha256，大文件退回 大小:mtime_ns。
+
+    每次运行都会重写 content.json 和卡片，mtime 必然变化；只看 mtime 会把内容没变的
+    文件也重新传一遍。
+    """
+    if st.st_size > HASH_MAX_BYTES:
+        return f"{st.st_size}:{st.st_mtime_ns}"
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _same_file(src: os.stat_result, src_fp: str, dest_path: str) -> bool:
+    try:
+        st = os.stat(dest_path)
+    except FileNotFoundError:
+        return False
+    if st.st_size != src.st_size:
+        return False
+    if st.st_mtime_ns == src.st_mtime_ns:
+        return True
+    return src.st_size <= HASH_MAX_BYTES and _fingerprint(dest_path, st) == src_fp
+
+
+def _copy_file(src: str, dest: str, st: os.stat_result) -> None:
+    """copyfile 走内核快速路径（macOS fcopyfile / Linux sendfile），再只补 mtime。
+
+    比 copy2 少了权限、flags、xattr 的拷贝；增量同步只需要 mtime 一致。
+    """
+    shutil.copyfile(src, dest)
+    os.utime(dest, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+
+def _sync_manifest(files: list[tuple[str, os.stat_result, str]]) -> str:
+    """源目录快照 (相对路径, 指纹) 的 sha256。"""
+    h = hashlib.sha256()
+    for rel, _, fp in sorted(files, key=lambda f: f[0]):
+        h.update(f"{rel}\0{fp}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
 def sync_to_icloud(out_dir: str) -> None:
-    """同步到 iCloud Obsidian Vault。"""
-    os.makedirs(ICLOUD_DIR, exist_ok=True)
+    """增量同步到 iCloud Obsidian Vault（类似 rsync -a --delete）。
+
+    内容没变的文件不动（小文件比内容哈希，大文件比大小和 mtime），避免 iCloud 重新
+    上传整个目录；源目录里已经没有的文件从目标删除。目标目录里的 .sync_manifest
+    记录上次同步时源目录的快照，快照没变就整个跳过，不去碰 iCloud 目录。
+    """
     dir_name = os.path.basename(out_dir)
     dest = os.path.join(ICLOUD_DIR, dir_name)
+    manifest_path = os.path.join(dest, SYNC_MANIFEST)
+
+    files = []
+    for root, _, names in os.walk(out_dir):
+        for n in names:
+            path = os.path.join(root, n)
+            st = os.stat(path)
+            files.append((os.path.relpath(path, out_dir), st, _fingerprint(path, st)))
+    manifest = _sync_manifest(files)
+    try:
+        with open(manifest_path, encoding="utf-8") as f:
+            if f.read() == manifest:
+                print(f"☁️ iCloud同步: {dest}（无变化，跳过）")
+                return
+    except OSError:
+        pass
+
+    keep = {dest, manifest_path}
+    jobs = []
+    for rel, st, fp in files:
+        dest_path = os.path.join(dest, rel)
+        dest_root = os.path.dirname(dest_path)
+        if dest_root not in keep:
+            # 目标目录（连同 ICLOUD_DIR 本身）只在第一次用到时创建
+            os.makedirs(dest_root, exist_ok=True)
+            while dest_root not in keep:
+                keep.add(dest_root)
+                dest_root = os.path.dirname(dest_root)
+        keep.add(dest_path)
+        if not _same_file(st, fp, dest_path):
+            jobs.append((os.path.join(out_dir, rel), dest_path, st))
+    os.makedirs(dest, exist_ok=True)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda job: _copy_file(*job), jobs))
+
+    removed = 0
+    for root, dirs, names in os.walk(dest, topdown=False):
+        for n in names:
+            path = os.path.join(root, n)
+            if path not in keep:
+                os.remove(path)
+                removed += 1
+        for d in dirs:
+            path = os.path.join(root, d)
+            if path not in keep:
+                shutil.rmtree(path, ignore_errors=True)
+    # 文件都到位后再写快照：中途失败下次会重新比对
+    atomic_write_text(manifest_path, manifest)
+    print(f"☁️ iCloud同步: {dest}（更新 {len(jobs)} 个文件，删除 {removed} 个）")
+
+
+def save_and_sync(
+    out_dir: str,
+    data: dict,
+    style_id: str,
+    content_type: str,
+    card_count: int,
+    write_txt: bool = True,
+    now: datetime | None = None,
+    source_key: str | None = None,
+) -> None:
+    """并行写 content 文件与 meta.json，写完后在后台同步到 iCloud。
+
+    content.txt 已经提前写好时传 write_txt=False。日志在主线程按固定顺序输出。
+    """
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        saves = [("内容JSON", pool.submit(save_content_json, out_dir, data))]
+        if write_txt:
+            saves.append(("内容文本", pool.submit(save_content_txt, out_dir, data)))
+        saves.append(("元信息", pool.submit(save_meta, out_dir, style_id, content_type, card_count, now, source_key)))
+        for label, f in saves:
+            print(f"💾 {label}: {f.result()}")
+    sync_to_icloud_async(out_dir)
+
+
+def _report_sync_error(future: Future) -> None:
+    if future.exception() is not None:
+        print(f"❌ iCloud同步失败: {future.exception()}", file=sys.stderr)
+
+
+def sync_to_icloud_async(out_dir: str) -> Future:
+    """把 iCloud 同步提交到后台线程，立即返回。"""
+    future = _SYNC_POOL.submit(sync_to_icloud, out_dir)
+    future.add_done_callback(_report_sync_error)
+    _pending_syncs.append(future)
+    print(f"☁️ iCloud同步已提交（后台）: {os.path.basename(out_dir)}")
+    return future
+
+
+def wait_for_sync() -> None:
+    """等所有已提交的后台 iCloud 同步结束。"""
+    if any(not f.done() for f in _pending_syncs):
+        print("⏳ 等待 iCloud 同步完成...")
+    wait(_pending_syncs)
+    _pending_syncs.clear()
+
+
+def _reset_cards_dir(cards_dir: str) -> None:
+    """清掉 cards/ 里上次渲染的 PNG：换风格重渲染时卡片可能变少，旧卡会留在目录里被同步出去。"""
+    os.makedirs(cards_dir, exist_ok=True)
+    for name in os.listdir(cards_dir):
+        if name.endswith(".png"):
+            os.remove(os.path.join(cards_dir, name))
+
+
+def deai_and_render_cards(
+    data: dict,
+    style_id: str,
+    writing_style: str | None,
+    date_str: str | None,
+    now: datetime | None = None,
+):
+    """去AI味的同时渲染内容卡。
+
+    de-AI 只改写 post_title/post_body/cover_title，内容卡（01.png…）不依赖这些字段，
+    可以在等模型时先渲染到 drafts 下的暂存目录；改写完成后再画封面，并把内容卡移进最终目录
+    （目录名取决于改写后的标题）。返回 (data, out_dir, card_paths)。
+    """
+    from card_gen import render_content_cards, render_cover
+    from de_ai import de_ai_content_json
+
+    os.makedirs(DRAFTS_DIR, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=".cards-", dir=DRAFTS_DIR)
+    try:
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            staged = pool.submit(render_content_cards, style_id, data, staging)
+            data = de_ai_content_json(data, style_id=writing_style)
+            staged_paths = staged.result()
+
+        out_dir = make_output_dir(get_title_for_dir(data), date_str, now=now)
+        cards_dir = os.path.join(out_dir, "cards")
+        _reset_cards_dir(cards_dir)
+        card_paths = [render_cover(style_id, data, os.path.join(cards_dir, "00_cover.png"))]
+        for src in staged_paths:
+            dest = os.path.join(cards_dir, os.path.basename(src))
+            os.replace(src, dest)
+            card_paths.append(dest)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return data, out_dir, card_paths
+
+
+def generate_content_deai(
+    digest_text: str,
+    date_str: str | None,
+    content_type: str,
+    writing_style: str | None,
+    max_output_tokens: int = MAX_OUTPUT_TOKENS,
+) -> dict:
+    """内容生成与去AI味合并成一次 Gemini 调用；合并输出解析失败时退回两步。"""
+    from de_ai import de_ai_content_json, style_rules_for
+
+    data = generate_content(
+        digest_text,
+        date_str,
+        content_type=content_type,
+        style_rules=style_rules_for(writing_style),
+        max_output_tokens=max_output_tokens,
+    )
+    if data is None:
+        print("⚠️ 合并输出不完整，退回 生成 + 去AI味 两步")
+        data = generate_content(digest_text, date_str, content_type=content_type, max_output_tokens=max_output_tokens)
+        data = de_ai_content_json(data, style_id=writing_style)
+    return data
+
 
-    if os.path.exists(dest):
-        shutil.rmtree(dest)
-    shutil.copytree(out_dir, dest)
-    print(f"☁️ iCloud同步: {dest}")
+def draft_source_key(digest_text: str, content_type: str, writing_style: str | None, deai: bool) -> str:
+    """同一份（精简后的）素材 + 内容类型 + 写作风格 → 同一个 key，记在 meta.json 里。"""
+    raw = f"{digest_text}\0{content_type}\0{writing_style or ''}\0{int(deai)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def find_existing_draft(date_str: str | None, source_key: str, now: datetime | None = None) -> str | None:
+    """在当天的草稿目录里找 meta.json 的 source_key 相同的草稿，有多个时取最新的。"""
+    prefix = f"{resolve_date_for_dir(date_str, now=now)}_"
+    try:
+        entries = [e for e in os.scandir(DRAFTS_DIR) if e.name.startswith(prefix) and e.is_dir()]
+    except FileNotFoundError:
+        return None
+    for entry in sorted(entries, key=lambda e: e.stat().st_mtime, reverse=True):
+        try:
+            with open(os.path.join(entry.path, "meta.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if meta.get("source_key") == source_key and os.path.exists(os.path.join(entry.path, "content.json")):
+            return entry.path
+    return None
 
 
 def pipeline_daily_brief(args):
@@ -162,78 +453,190 @@ def pipeline_daily_brief(args):
     print("📡 Step 1: 加载巡逻素材")
     print("=" * 60)
 
+    now = datetime.now()
     if args.input:
         digest_text = load_digest(args.input)
-        date_str = args.date or datetime.now().strftime("%m.%d")
+        date_str = args.date or now.strftime("%m.%d")
     else:
         digest_text, date_str = load_latest_digest(args.workspace, args.source)
         if args.date:
             date_str = args.date
 
-    print(f"✅ 素材长度: {len(digest_text)}字\n")
+    raw_len = len(digest_text)
+    digest_text = compress_digest(digest_text)
+    print(f"✅ 素材长度: {len(digest_text)}字（精简前 {raw_len}字）\n")
+
+    writing_style = getattr(args, "writing_style", None)
+    max_tokens = getattr(args, "max_tokens", MAX_OUTPUT_TOKENS)
+    skip_deai = getattr(args, "skip_deai", False)
+    single_pass = getattr(args, "single_pass", False) and not skip_deai
+    dry_run = getattr(args, "dry_run", False)
+
+    # 同一份素材已经出过草稿：直接用它的 content.json，不再调用模型（--force / --no-cache 重新生成）
+    source_key = draft_source_key(digest_text, args.type, writing_style, not skip_deai)
+    regenerate = getattr(args, "force", False) or getattr(args, "no_cache", False)
+    # 目录日期只解析一次，查已有草稿和写新草稿用同一个 YYYY-MM-DD
+    dir_date = resolve_date_for_dir(date_str, now=now)
+    existing = None if regenerate else find_existing_draft(dir_date, source_key, now)
+    if existing:
+        print(f"⏭️ 已有同一素材的草稿，跳过生成: {existing}（--force 可重新生成）")
+        with open(os.path.join(existing, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(os.path.join(existing, "content.json"), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if meta.get("style_id") == args.style:
+            print(f"\n📂 输出目录: {existing}")
+            return existing, data
+        if dry_run:
+            print(f"🔍 dry-run: 将用 {args.style} 重新渲染卡片，不调用模型")
+            return None
+        data.pop("card_paths", None)
+        print()
+        return finish_draft(data, args, dir_date, deai=False, now=now, source_key=source_key)
+
+    if dry_run:
+        mode = "合并生成 + 去AI味" if single_pass else ("生成" if skip_deai else "生成 + 去AI味")
+        print(f"🔍 dry-run: 将调用 Gemini {mode}（类型: {args.type}, 输出上限 {max_tokens} tokens），未写任何文件")
+        return None
 
     print("=" * 60)
-    print("🤖 Step 2: Gemini 精修内容")
+    if single_pass:
+        print(f"🤖 Step 2: Gemini 精修内容 + 去AI味 (风格: {writing_style or '默认'})")
+    else:
+        print("🤖 Step 2: Gemini 精修内容")
     print("=" * 60)
 
-    data = generate_content(digest_text, date_str, content_type=args.type)
+    # 相似素材复用：按内容类型（合并模式下再加写作风格）分命名空间
+    reuse_similar = getattr(args, "reuse_similar", False) and not getattr(args, "no_cache", False)
+    namespace = f"{args.type}|{writing_style or ''}" if single_pass else args.type
+    hit = semantic_cache.lookup(digest_text, namespace, date_str) if reuse_similar else None
+    if hit:
+        data, score = hit
+        print(f"♻️ 素材与已生成内容相似度 {score:.0%}，直接复用")
+    elif single_pass:
+        data = generate_content_deai(digest_text, date_str, args.type, writing_style, max_tokens)
+    else:
+        data = generate_content(digest_text, date_str, content_type=args.type, max_output_tokens=max_tokens)
+    if reuse_similar and not hit:
+        semantic_cache.store(digest_text, namespace, date_str, data)
     print()
 
-    # de-AI 步骤
+    return finish_draft(data, args, dir_date, deai=not skip_deai and not single_pass, now=now, source_key=source_key)
+
+
+def finish_draft(
+    data: dict,
+    args,
+    date_str: str | None,
+    deai: bool,
+    now: datetime | None = None,
+    source_key: str | None = None,
+):
+    """生成内容之后的步骤：(去AI味 +) 生成卡片 -> 保存 -> iCloud 同步。返回 (out_dir, data)。
+
+    now 是本次运行的时间，目录日期和 meta.json 的 created_at 都用它；
+    source_key 记进 meta.json，供下次 find_existing_draft 识别同一素材。
+    """
+    now = now or datetime.now()
+    from card_gen import generate_cards
+
     writing_style = getattr(args, "writing_style", None)
-    if not getattr(args, "skip_deai", False):
+
+    # de-AI 步骤（与内容卡渲染并行）
+    txt_saved = False
+    if deai:
         print("=" * 60)
-        print(f"🧹 Step 2.5: 去AI味 (风格: {writing_style or '默认'})")
+        print(f"🧹 Step 2.5 + 🎨 Step 3: 去AI味 (风格: {writing_style or '默认'}) + 生成卡片")
+        print("=" * 60)
+        data, out_dir, card_paths = deai_and_render_cards(data, args.style, writing_style, date_str, now)
+    else:
+        print("=" * 60)
+        print("🎨 Step 3: 生成卡片")
         print("=" * 60)
-        data = de_ai_content_json(data, style_id=writing_style)
-        print()
+
+        out_dir = make_output_dir(get_title_for_dir(data), date_str, now=now)
+        cards_dir = os.path.join(out_dir, "cards")
+        _reset_cards_dir(cards_dir)
+        # 文案已定稿，content.txt 和卡片渲染同时进行
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            txt_future = pool.submit(save_content_txt, out_dir, data)
+            card_paths = generate_cards(style_id=args.style, content_data=data, output_dir=cards_dir)
+            print(f"💾 内容文本: {txt_future.result()}")
+        txt_saved = True
+    data["card_paths"] = card_paths
+    print(f"✅ 共 {len(card_paths)} 张卡片\n")
 
     print("=" * 60)
-    print("🎨 Step 3: 生成卡片")
+    print("💾 Step 4: 保存内容 + ☁️ Step 5: iCloud 同步")
     print("=" * 60)
 
-    out_dir = make_output_dir(get_title_for_dir(data), date_str)
-    cards_dir = os.path.join(out_dir, "cards")
-    card_paths = generate_cards(style_id=args.style, content_data=data, output_dir=cards_dir)
-    data["card_paths"] = card_paths
-    print(f"✅ 共 {len(card_paths)} 张卡片\n")
+    save_and_sync(
+        out_dir, data, args.style, args.type, len(card_paths),
+        write_txt=not txt_saved, now=now, source_key=source_key,
+    )
+    print(f"\n📂 输出目录: {out_dir}")
+    return out_dir, data
+
+
+def _date_from_filename(path: str, now: datetime) -> str:
+    """digest 文件名以 YYYY-MM-DD 开头时取这个日期，否则用 now 的日期；返回 YYYY-MM-DD。
+
+    目录日期必须带年份：只留 MM.DD 的话，1 月批量处理 12 月的 digest 会被补成今年。
+    """
+    m = _ISO_DATE_PREFIX_RE.match(os.path.basename(path))
+    return m.group(0) if m else now.strftime("%Y-%m-%d")
+
 
+def pipeline_batch_daily(args):
+    """多份 digest 一次 Gemini 调用生成，再逐篇出卡片、保存。"""
     print("=" * 60)
-    print("💾 Step 4: 保存内容")
+    print(f"📡 Step 1: 加载 {len(args.inputs)} 份素材")
     print("=" * 60)
 
-    save_content_files(out_dir, data)
-    save_meta(out_dir, args.style, args.type, len(card_paths))
+    now = datetime.now()
+    # 目录用完整日期，prompt 里的日期（封面“AI日报 MM.DD”）用 MM.DD
+    dir_dates = [_date_from_filename(path, now) for path in args.inputs]
+    digests = [
+        (compress_digest(load_digest(path)), f"{d[5:7]}.{d[8:10]}") for path, d in zip(args.inputs, dir_dates)
+    ]
+    for path, (text, _), dir_date in zip(args.inputs, digests, dir_dates):
+        print(f"✅ {os.path.basename(path)}: {len(text)}字 ({dir_date})")
     print()
 
     print("=" * 60)
-    print("☁️ Step 5: iCloud 同步")
+    print("🤖 Step 2: Gemini 批量精修内容")
     print("=" * 60)
 
-    sync_to_icloud(out_dir)
-    print(f"\n📂 输出目录: {out_dir}")
-    return out_dir, data
+    max_tokens = getattr(args, "max_tokens", MAX_OUTPUT_TOKENS)
+    results = generate_content_batch(digests, content_type=args.type, max_output_tokens=max_tokens)
+    print()
+
+    deai = not getattr(args, "skip_deai", False)
+    # 逐篇顺序收尾：卡片渲染吃 CPU，长卡组已分到多进程，多篇并发只会抢 GIL 和核；
+    # 每篇的去AI味已和本篇渲染重叠，iCloud 同步在后台线程；并发还会让各步日志交错
+    return [finish_draft(data, args, dir_date, deai=deai, now=now) for data, dir_date in zip(results, dir_dates)]
 
 
 def pipeline_from_json(args):
     """从已有 content.json 生成卡片并保存到草稿目录。"""
+    from card_gen import generate_cards
+
     with open(args.input, "r", encoding="utf-8") as f:
         data = json.load(f)
 
-    # de-AI 步骤
+    now = datetime.now()
+    # de-AI 步骤（与内容卡渲染并行）
     writing_style = getattr(args, "writing_style", None)
     if not getattr(args, "skip_deai", False):
         print(f"🧹 去AI味 (风格: {writing_style or '默认'})")
-        data = de_ai_content_json(data, style_id=writing_style)
-
-    out_dir = make_output_dir(get_title_for_dir(data), args.date)
-    cards_dir = os.path.join(out_dir, "cards")
-    card_paths = generate_cards(style_id=args.style, content_data=data, output_dir=cards_dir)
+        data, out_dir, card_paths = deai_and_render_cards(data, args.style, writing_style, args.date, now)
+    else:
+        out_dir = make_output_dir(get_title_for_dir(data), args.date, now=now)
+        cards_dir = os.path.join(out_dir, "cards")
+        card_paths = generate_cards(style_id=args.style, content_data=data, output_dir=cards_dir)
 
     data["card_paths"] = card_paths
-    save_content_files(out_dir, data)
-    save_meta(out_dir, args.style, args.type, len(card_paths))
-    sync_to_icloud(out_dir)
+    save_and_sync(out_dir, data, args.style, args.type, len(card_paths), now=now)
 
     print(f"\n📂 输出目录: {out_dir}")
     return out_dir, data
@@ -253,6 +656,20 @@ def main():
     p_daily.add_argument("--type", choices=TYPE_CHOICES, default="brief")
     p_daily.add_argument("--writing-style", help="写作风格ID（如 闺蜜唠嗑/老司机带路/毒舌测评）")
     p_daily.add_argument("--skip-deai", action="store_true", help="跳过去AI味步骤")
+    p_daily.add_argument("--single-pass", action="store_true", help="内容生成与去AI味合并为一次模型调用")
+    p_daily.add_argument("--max-tokens", type=int, default=MAX_OUTPUT_TOKENS, help="内容生成的输出 token 上限")
+    p_daily.add_argument("--reuse-similar", action="store_true", help="当天素材与已生成过的高度相似时直接复用其内容")
+    p_daily.add_argument("--force", action="store_true", help="同一素材已有草稿时也重新生成")
+    p_daily.add_argument("--dry-run", action="store_true", help="只加载素材、检查已有草稿，不调用模型也不写文件")
+
+    # batch-daily
+    p_batch = sub.add_parser("batch-daily", help="多份 digest 一次模型调用批量生成")
+    p_batch.add_argument("--inputs", nargs="+", required=True, help="digest 文件（文件名以 YYYY-MM-DD 开头时取其日期）")
+    p_batch.add_argument("--style", choices=STYLE_CHOICES, default="typography-card")
+    p_batch.add_argument("--type", choices=TYPE_CHOICES, default="brief")
+    p_batch.add_argument("--writing-style", help="写作风格ID（如 闺蜜唠嗑/老司机带路/毒舌测评）")
+    p_batch.add_argument("--skip-deai", action="store_true", help="跳过去AI味步骤")
+    p_batch.add_argument("--max-tokens", type=int, default=MAX_OUTPUT_TOKENS, help="单篇输出 token 上限")
 
     # from-json
     p_json = sub.add_parser("from-json", help="从已有 content.json 生成卡片")
@@ -263,15 +680,30 @@ def main():
     p_json.add_argument("--writing-style", help="写作风格ID（如 闺蜜唠嗑/老司机带路/毒舌测评）")
     p_json.add_argument("--skip-deai", action="store_true", help="跳过去AI味步骤")
 
+    for p in (p_daily, p_batch, p_json):
+        p.add_argument("--no-cache", action="store_true", help="不读写本地模型输出缓存")
+        p.add_argument("--cache-ttl", type=float, default=7, help="模型输出缓存有效期（天，默认7）")
+        p.add_argument("--cache-clear", action="store_true", help="运行前清空模型输出缓存和相似素材复用记录")
+
     args = parser.parse_args()
     if not args.command:
         parser.print_help()
         sys.exit(1)
-
-    if args.command == "daily-brief":
-        pipeline_daily_brief(args)
-    elif args.command == "from-json":
-        pipeline_from_json(args)
+    if args.cache_clear:
+        print(f"🗑️ 已清空模型缓存: {response_cache.clear()} 条，相似素材记录: {semantic_cache.clear()} 条")
+    if args.no_cache:
+        response_cache.disable()
+    response_cache.set_ttl(args.cache_ttl * 24 * 3600)
+
+    try:
+        if args.command == "daily-brief":
+            pipeline_daily_brief(args)
+        elif args.command == "batch-daily":
+            pipeline_batch_daily(args)
+        elif args.command == "from-json":
+            pipeline_from_json(args)
+    finally:
+        wait_for_sync()
 
 
 if __name__ == "__main__":
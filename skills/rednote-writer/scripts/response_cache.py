@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Gemini 输出的本地磁盘缓存。
+
+相同的 system prompt + user prompt + 模型配置 → 直接复用上次成功的输出，
+调试排版/风格时反复跑同一份素材不必重新请求模型。
+
+缓存目录默认 ~/.cache/rednote-writer，可用 REDNOTE_CACHE_DIR 覆盖；
+设置 REDNOTE_NO_CACHE=1 或调用 disable()（CLI 的 --no-cache）可绕过。
+条目默认 7 天过期（set_ttl / --cache-ttl），clear()（--cache-clear）清空。
+"""
+
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+from fileutil import atomic_write_text
+
+CACHE_DIR = Path(os.environ.get("REDNOTE_CACHE_DIR", "~/.cache/rednote-writer")).expanduser()
+
+DEFAULT_TTL = 7 * 24 * 3600
+
+_enabled = os.environ.get("REDNOTE_NO_CACHE", "") in ("", "0")
+_ttl: float = DEFAULT_TTL
+
+
+def disable() -> None:
+    """本进程内不再读写缓存。"""
+    global _enabled
+    _enabled = False
+
+
+def set_ttl(seconds: float) -> None:
+    """修改过期时间（秒），只影响读取。"""
+    global _ttl
+    _ttl = seconds
+
+
+def ttl() -> float:
+    """当前过期时间（秒）。"""
+    return _ttl
+
+
+def clear() -> int:
+    """删除所有缓存条目，返回删除数量。
+
+    只删以 sha256 命名的条目；同目录下的 hedge 延迟样本、上下文缓存索引等保留。
+    """
+    removed = 0
+    for path in CACHE_DIR.glob("*.json"):
+        if len(path.stem) != 64:
+            continue
+        with contextlib.suppress(OSError):
+            path.unlink()
+            removed += 1
+    return removed
+
+
+def _path(system_prompt: str, user_prompt: str, model: str) -> Path:
+    key = hashlib.sha256(f"{system_prompt}\x00{user_prompt}\x00{model}".encode("utf-8")).hexdigest()
+    return CACHE_DIR / f"{key}.json"
+
+
+def get(system_prompt: str, user_prompt: str, model: str) -> dict | None:
+    """命中返回缓存的 dict，未命中（过期或缓存损坏）返回 None。"""
+    if not _enabled:
+        return None
+    path = _path(system_prompt, user_prompt, model)
+    try:
+        if time.time() - path.stat().st_mtime > _ttl:
+            return None
+        return json.loads(path.read_bytes())
+    except (OSError, ValueError):
+        return None
+
+
+def put(system_prompt: str, user_prompt: str, model: str, value: dict) -> None:
+    """写入缓存；先写临时文件再 rename，写失败不影响主流程。
+
+    ``model`` 是缓存键里的主模型。value["model"] 是实际产出结果的模型，与主模型不同
+    （hedge 时 fallback 先返回）就不写：fallback 的结果若进缓存，TTL 内重跑都拿到较弱的
+    输出，主模型不会再被尝试。
+    """
+    if not _enabled or value.get("model", model) != model:
+        return
+    with contextlib.suppress(OSError):
+        atomic_write_text(_path(system_prompt, user_prompt, model), json.dumps(value, ensure_ascii=False))
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""相似素材的内容复用缓存。
+
+response_cache 只在 prompt 完全一致时命中；巡逻素材重跑时常常只多了一两条，
+精确缓存就全部失效。这里给每份素材算一个 bottom-k 指纹（字符 n-gram 哈希里
+最小的 K 个），用它估算两份素材的 Jaccard 相似度，足够相似就直接复用上次
+生成的 content.json。
+
+只在同一天、同一命名空间（内容类型等）内比较，避免把昨天的日报当成今天的。
+指纹存在 response_cache.CACHE_DIR 下的 SQLite 里，只用标准库。
+"""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import sqlite3
+import time
+import zlib
+from array import array
+
+import response_cache
+
+SHINGLE = 5  # 字符 n-gram 长度
+SKETCH_SIZE = 256  # 每份素材保留的最小哈希个数
+SIMILARITY_THRESHOLD = 0.85
+DB_PATH = response_cache.CACHE_DIR / "semantic.sqlite3"
+
+
+def _sketch(text: str) -> array:
+    """bottom-k 指纹：所有 n-gram 的 crc32 中最小的 SKETCH_SIZE 个（升序）。"""
+    text = "".join(text.split())
+    hashes = {zlib.crc32(text[i:i + SHINGLE].encode("utf-8")) for i in range(max(len(text) - SHINGLE + 1, 1))}
+    return array("I", sorted(hashes)[:SKETCH_SIZE])
+
+
+def similarity(a: array, b: array) -> float:
+    """用两个 bottom-k 指纹估算 Jaccard 相似度。"""
+    if not a or not b:
+        return 0.0
+    union_k = sorted(set(a) | set(b))[:SKETCH_SIZE]
+    both = set(a) & set(b)
+    return sum(1 for h in union_k if h in both) / len(union_k)
+
+
+def _connect() -> sqlite3.Connection:
+    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(DB_PATH)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS digests ("
+        "namespace TEXT, date_str TEXT, sketch BLOB, content_json TEXT, created_at REAL)"
+    )
+    return conn
+
+
+def lookup(
+    digest_text: str,
+    namespace: str,
+    date_str: str,
+    threshold: float = SIMILARITY_THRESHOLD,
+) -> tuple[dict, float] | None:
+    """找同一天、同命名空间里最相似的已生成内容；相似度达标返回 (content, 相似度)。"""
+    sketch = _sketch(digest_text)
+    cutoff = time.time() - response_cache.ttl()
+    try:
+        with contextlib.closing(_connect()) as conn:
+            rows = conn.execute(
+                "SELECT sketch, content_json FROM digests WHERE namespace = ? AND date_str = ? AND created_at > ?",
+                (namespace, date_str, cutoff),
+            ).fetchall()
+    except (sqlite3.Error, OSError):
+        return None
+
+    best: tuple[float, str] | None = None
+    for blob, content_json in rows:
+        score = similarity(sketch, array("I", blob))
+        if best is None or score > best[0]:
+            best = (score, content_json)
+    if best is None or best[0] < threshold:
+        return None
+    return json.loads(best[1]), best[0]
+
+
+def store(digest_text: str, namespace: str, date_str: str, content: dict) -> None:
+    """记录一份素材的指纹和对应生成结果；写失败不影响主流程。"""
+    try:
+        with contextlib.closing(_connect()) as conn, conn:
+            conn.execute(
+                "INSERT INTO digests VALUES (?, ?, ?, ?, ?)",
+                (namespace, date_str, _sketch(digest_text).tobytes(), json.dumps(content, ensure_ascii=False), time.time()),
+            )
+    except (sqlite3.Error, OSError):
+        pass
+
+
+def clear() -> int:
+    """删除所有指纹记录，返回删除数量；数据库不存在时返回 0。"""
+    if not DB_PATH.exists():
+        return 0
+    try:
+        with contextlib.closing(_connect()) as conn, conn:
+            return conn.execute("DELETE FROM digests").rowcount
+    except (sqlite3.Error, OSError):
+        return 0
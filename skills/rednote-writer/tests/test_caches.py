@@ -0,0 +1,87 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
+
+import response_cache  # noqa: E402
+import semantic_cache  # noqa: E402
+
+DIGEST = "OpenAI 发布 GPT-5，推理能力大幅提升。Anthropic 更新 Claude，支持更长上下文。" * 3
+
+
+class CacheDirTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        for patcher in (
+            patch.object(response_cache, "CACHE_DIR", self.tmp),
+            patch.object(response_cache, "_enabled", True),
+            patch.object(response_cache, "_ttl", response_cache.DEFAULT_TTL),
+            patch.object(semantic_cache, "DB_PATH", self.tmp / "semantic.sqlite3"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+class TestResponseCache(CacheDirTestCase):
+    def test_put_then_get(self) -> None:
+        response_cache.put("sys", "user", "model", {"a": 1})
+        self.assertEqual(response_cache.get("sys", "user", "model"), {"a": 1})
+        self.assertIsNone(response_cache.get("sys", "user", "other-model"))
+
+    def test_result_from_other_model_is_not_stored(self) -> None:
+        response_cache.put("sys", "user", "primary", {"model": "fallback", "text": "t"})
+        self.assertIsNone(response_cache.get("sys", "user", "primary"))
+        response_cache.put("sys", "user", "primary", {"model": "primary", "text": "t"})
+        self.assertEqual(response_cache.get("sys", "user", "primary"), {"model": "primary", "text": "t"})
+
+    def test_expired_entry_is_a_miss(self) -> None:
+        response_cache.put("sys", "user", "model", {"a": 1})
+        old = time.time() - 3600
+        os.utime(response_cache._path("sys", "user", "model"), (old, old))
+        response_cache.set_ttl(60)
+        self.assertIsNone(response_cache.get("sys", "user", "model"))
+        response_cache.set_ttl(7200)
+        self.assertEqual(response_cache.get("sys", "user", "model"), {"a": 1})
+
+    def test_clear_keeps_non_entry_files(self) -> None:
+        response_cache.put("sys", "u1", "model", {"a": 1})
+        response_cache.put("sys", "u2", "model", {"a": 2})
+        (self.tmp / "ttfc.json").write_text("{}")
+        self.assertEqual(response_cache.clear(), 2)
+        self.assertIsNone(response_cache.get("sys", "u1", "model"))
+        self.assertTrue((self.tmp / "ttfc.json").exists())
+
+
+class TestSemanticCache(CacheDirTestCase):
+    def test_similar_digest_hits(self) -> None:
+        semantic_cache.store(DIGEST, "brief", "2026-10-16", {"post_title": "T"})
+        hit = semantic_cache.lookup(DIGEST + "补充一条小消息。", "brief", "2026-10-16")
+        self.assertIsNotNone(hit)
+        content, score = hit
+        self.assertEqual(content, {"post_title": "T"})
+        self.assertGreaterEqual(score, semantic_cache.SIMILARITY_THRESHOLD)
+
+    def test_other_namespace_date_or_text_misses(self) -> None:
+        semantic_cache.store(DIGEST, "brief", "2026-10-16", {"post_title": "T"})
+        self.assertIsNone(semantic_cache.lookup(DIGEST, "analysis", "2026-10-16"))
+        self.assertIsNone(semantic_cache.lookup(DIGEST, "brief", "2026-10-17"))
+        self.assertIsNone(semantic_cache.lookup("完全不同的一份素材，讲的是芯片和能源。" * 3, "brief", "2026-10-16"))
+
+    def test_expired_and_cleared_entries_miss(self) -> None:
+        semantic_cache.store(DIGEST, "brief", "2026-10-16", {"post_title": "T"})
+        response_cache.set_ttl(-1)
+        self.assertIsNone(semantic_cache.lookup(DIGEST, "brief", "2026-10-16"))
+        response_cache.set_ttl(3600)
+        self.assertEqual(semantic_cache.clear(), 1)
+        self.assertIsNone(semantic_cache.lookup(DIGEST, "brief", "2026-10-16"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import json
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
+
+from de_ai import _fix_json_newlines, _parse_rewrite  # noqa: E402
+
+
+class TestFixJsonNewlines(unittest.TestCase):
+    def test_escapes_raw_newlines_inside_strings(self) -> None:
+        raw = '{"post_body": "第一行\n第二行", "tags": ["a"]}'
+        self.assertEqual(json.loads(_fix_json_newlines(raw))["post_body"], "第一行\n第二行")
+
+    def test_keeps_newlines_between_tokens(self) -> None:
+        raw = '{\n  "a": "x",\n  "b": "y"\n}'
+        self.assertEqual(_fix_json_newlines(raw), raw)
+
+    def test_keeps_existing_escapes(self) -> None:
+        raw = '{"a": "引号 \\" 反斜杠 \\\\\n下一行 \\n"}'
+        self.assertEqual(json.loads(_fix_json_newlines(raw))["a"], '引号 " 反斜杠 \\\n下一行 \n')
+
+    def test_unterminated_string(self) -> None:
+        # 输出被截断时最后一个字符串没有闭合，里面的换行照样转义
+        self.assertEqual(_fix_json_newlines('{"a": "x\ny'), '{"a": "x\\ny')
+
+
+class TestParseRewrite(unittest.TestCase):
+    def test_field_blocks(self) -> None:
+        raw = (
+            "<<<POST_TITLE>>>\n标题\n<<<END>>>\n"
+            "<<<POST_BODY>>>\n第一段\n\n第二段\n<<<END>>>\n"
+            "<<<UNKNOWN>>>\n忽略\n<<<END>>>"
+        )
+        self.assertEqual(_parse_rewrite(raw), {"post_title": "标题", "post_body": "第一段\n\n第二段"})
+
+    def test_falls_back_to_fenced_json(self) -> None:
+        raw = '说明\n```json\n{"post_title": "T", "post_body": "a\nb"}\n```'
+        self.assertEqual(_parse_rewrite(raw), {"post_title": "T", "post_body": "a\nb"})
+
+    def test_unparseable_returns_none(self) -> None:
+        self.assertIsNone(_parse_rewrite("not json at all {"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import sys
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
+
+import hedge  # noqa: E402
+
+
+def fake_request(behaviour: dict, log: list):
+    """behaviour[model] = (首段延迟秒数, 结果或异常)；cancel 后记录 (model, "cancelled")。"""
+
+    def request(model, started, cancel):
+        log.append((model, "start"))
+        delay, outcome = behaviour[model]
+        if cancel.wait(delay):
+            log.append((model, "cancelled"))
+            return None
+        if started:
+            started.set()
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    return request
+
+
+class TestRace(unittest.TestCase):
+    def setUp(self) -> None:
+        patcher = patch.object(hedge, "delay", lambda model: 0.05)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.log: list = []
+
+    def race(self, behaviour: dict):
+        return hedge.race("primary", "fallback", fake_request(behaviour, self.log))
+
+    def test_fast_primary_never_hedges(self) -> None:
+        self.assertEqual(self.race({"primary": (0, "P"), "fallback": (0, "F")}), ("primary", "P"))
+        self.assertNotIn(("fallback", "start"), self.log)
+
+    def test_fallback_error_keeps_waiting_for_primary(self) -> None:
+        result = self.race({"primary": (0.3, "P"), "fallback": (0, RuntimeError("400 INVALID_ARGUMENT"))})
+        self.assertEqual(result, ("primary", "P"))
+
+    def test_primary_failure_starts_fallback(self) -> None:
+        result = self.race({"primary": (0, RuntimeError("500")), "fallback": (0, "F")})
+        self.assertEqual(result, ("fallback", "F"))
+
+    def test_empty_output_counts_as_failure(self) -> None:
+        self.assertEqual(self.race({"primary": (0, ""), "fallback": (0, "F")}), ("fallback", "F"))
+
+    def test_both_failing_returns_none(self) -> None:
+        result = self.race({"primary": (0.1, RuntimeError("503")), "fallback": (0, RuntimeError("429"))})
+        self.assertIsNone(result)
+
+    def test_loser_is_cancelled(self) -> None:
+        t0 = time.monotonic()
+        result = self.race({"primary": (30, "P"), "fallback": (0, "F")})
+        self.assertEqual(result, ("fallback", "F"))
+        self.assertLess(time.monotonic() - t0, 5)
+        deadline = time.monotonic() + 2
+        while ("primary", "cancelled") not in self.log and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertIn(("primary", "cancelled"), self.log)
+
+    def test_request_threads_do_not_block_exit(self) -> None:
+        self.race({"primary": (30, "P"), "fallback": (0, "F")})
+        self.assertTrue(all(t.daemon for t in threading.enumerate() if t.name.startswith("hedge-")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import argparse
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
+
+import card_gen  # noqa: E402
+import rednote_writer  # noqa: E402
+
+
+class TestDumpJson(unittest.TestCase):
+    # content.json / meta.json 里会出现的值：中文、emoji、控制字符、嵌套、空容器、整数和普通小数。
+    # 指数形式的浮点数两边写法不同（1e16 / 1e+16），草稿里不会出现，不在比较范围内。
+    SAMPLE = {
+        "cover_title": "AI 早报 10.16\n大新闻",
+        "post_title": "GPT-5 发布 🚀",
+        "tags": ["AI", "科技"],
+        "items": [
+            {"title": "OpenAI 融资 $20M", "body": "第一行\n---\n\t引号 \" 反斜杠 \\ \x1f"},
+            {"title": "", "body": ""},
+        ],
+        "sections": [],
+        "extra": {},
+        "card_count": 7,
+        "score": 0.85,
+        "hook": None,
+        "draft": True,
+    }
+
+    def _stdlib(self, obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+
+    @unittest.skipUnless(rednote_writer.HAS_ORJSON, "orjson 未安装")
+    def test_orjson_matches_stdlib(self) -> None:
+        self.assertEqual(rednote_writer.dump_json(self.SAMPLE), self._stdlib(self.SAMPLE))
+
+    @unittest.skipUnless(rednote_writer.HAS_ORJSON, "orjson 未安装")
+    def test_non_str_keys_match_stdlib(self) -> None:
+        obj = {1: "a", "b": [1, 2]}
+        self.assertEqual(rednote_writer.dump_json(obj), self._stdlib(obj))
+
+    def test_round_trip(self) -> None:
+        self.assertEqual(json.loads(rednote_writer.dump_json(self.SAMPLE)), self.SAMPLE)
+
+
+class TestRestyleExistingDraft(unittest.TestCase):
+    """同一素材换 --style 重跑：复用已有草稿的 content.json，只重渲染卡片。"""
+
+    CARD_COUNTS = {"typography-card": 6, "text-only": 1}
+
+    def setUp(self) -> None:
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        digest = self.tmp / "digest.md"
+        digest.write_text("今天的素材：OpenAI 发布新模型。", encoding="utf-8")
+        self.digest = str(digest)
+        for patcher in (
+            patch.object(rednote_writer, "DRAFTS_DIR", str(self.tmp / "drafts")),
+            patch.object(rednote_writer, "ICLOUD_DIR", str(self.tmp / "icloud")),
+            patch.object(rednote_writer, "generate_content", lambda *a, **k: {"post_title": "标题", "items": []}),
+            patch.object(card_gen, "generate_cards", self._fake_generate_cards),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _fake_generate_cards(self, style_id: str, content_data: dict, output_dir: str) -> list[str]:
+        os.makedirs(output_dir, exist_ok=True)
+        paths = []
+        for i in range(self.CARD_COUNTS[style_id]):
+            path = os.path.join(output_dir, "00_cover.png" if i == 0 else f"{i:02d}.png")
+            Path(path).write_bytes(style_id.encode("utf-8"))
+            paths.append(path)
+        return paths
+
+    def _run(self, style: str) -> str:
+        args = argparse.Namespace(
+            input=self.digest, date="2026-10-16", type="brief", style=style, skip_deai=True,
+            force=False, no_cache=False, dry_run=False, single_pass=False, reuse_similar=False,
+        )
+        with redirect_stdout(io.StringIO()):
+            out_dir, _ = rednote_writer.pipeline_daily_brief(args)
+            rednote_writer.wait_for_sync()
+        return out_dir
+
+    def test_fewer_cards_leave_no_stale_pngs(self) -> None:
+        first = self._run("typography-card")
+        second = self._run("text-only")
+        self.assertEqual(first, second)
+        cards = sorted(os.listdir(os.path.join(second, "cards")))
+        self.assertEqual(cards, ["00_cover.png"])
+        self.assertEqual(Path(second, "cards", "00_cover.png").read_bytes(), b"text-only")
+        synced = Path(rednote_writer.ICLOUD_DIR, os.path.basename(second), "cards")
+        self.assertEqual(sorted(os.listdir(synced)), ["00_cover.png"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,14 @@
+#!/usr/bin/env python3
+"""
+scout_x 启动入口 - 参数、输出与直接运行 scout_x.py 完全相同
+直接运行的脚本每次都要重新编译（约15ms），作为模块导入则用 __pycache__ 里的字节码；
+health/status 被频繁轮询时用这个入口
+"""
+
+import sys
+
+import scout_x
+
+if __name__ == '__main__':
+    sys.argv[0] = scout_x.__file__  # usage/报错里的程序名仍是 scout_x.py
+    scout_x.main()
@@ -7,12 +7,36 @@ Scout X Patrol - Scout专用的X/Twitter巡逻脚本
 import os
 import sys
 import json
-import yaml
-import subprocess
+import functools
+import math
+import re
+import pickle
+import zlib
+import base64
+import hashlib
+import heapq
 import argparse
-from datetime import datetime, timedelta
+import threading
+import time
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from collections import defaultdict
+from urllib.parse import urlparse
+from collections import defaultdict, deque
+from itertools import chain
+
+# ── orjson (optional, faster state/metrics I/O) ──
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+# ── pyahocorasick (optional, exclude-keyword matching) ──
+try:
+    import ahocorasick
+    HAS_AHOCORASICK = True
+except ImportError:
+    HAS_AHOCORASICK = False
 
 # ── paths ──────────────────────────────────────────────────────
 WORKSPACE = Path(os.environ.get("SCOUT_WORKSPACE", os.path.expanduser("~/.openclaw/workspace")))
@@ -20,180 +44,560 @@ WATCHLIST_PATH = WORKSPACE / "sources" / "x-watchlist.yaml"
 STATE_PATH = WORKSPACE / "sources" / "x-patrol-state.json"
 METRICS_PATH = WORKSPACE / "sources" / "x-watchlist-metrics.json"
 RAW_DIR = WORKSPACE / "raw" / "x-posts"
+THREAD_CACHE_DIR = WORKSPACE / "cache" / "threads"
+USERS_CACHE_PATH = WORKSPACE / "cache" / "users.json"
+RATE_LIMITS_PATH = WORKSPACE / "cache" / "rate_limits.json"
+CONFIG_CACHE_PATH = WORKSPACE / "cache" / "config.pkl"
 X_API_SCRIPT = Path(os.path.expanduser("~/Desktop/openclaw/skills/x-api/scripts/x_api.py"))
-X_API_VENV = Path(os.path.expanduser("~/Desktop/openclaw/skills/x-api/.venv/bin/python3"))
+
+TWEET_FIELDS = "author_id,public_metrics,conversation_id,referenced_tweets,created_at"
+USER_FIELDS = "id,username,name,description,public_metrics"
+SEARCH_WINDOW = timedelta(days=7)  # /tweets/search/recent 只能搜到最近7天
+USERS_BATCH = 100  # /users 和 /users/by 每次最多100个
+HTTP_POOL_SIZE = 16  # 每个host保持的连接数，不小于 schedule.parallel_workers
+RATE_LIMIT_WINDOW = 15 * 60  # X按15分钟窗口计额度
+RATE_LIMIT_RETRY_WAIT = 60  # 429 没带重置时间时等多久（秒）
+USERS_CACHE_TTL = 7 * 24 * 3600  # user ID ↔ 用户名 缓存一周
+
+# thread缓存：按conversation_id存盘，默认24小时（SCOUT_THREAD_CACHE_TTL秒）；
+# 最后一条推文已超出搜索窗口的thread不会再变，也拉不到了，一直用缓存
+THREAD_CACHE_TTL = float(os.environ.get("SCOUT_THREAD_CACHE_TTL", 24 * 3600))
+thread_cache_enabled = True
 
 
 # ── config, state & metrics ────────────────────────────────────
+def atomic_write(path: Path, data: bytes):
+    """先写同目录临时文件再os.replace，中途Ctrl-C不会留下写了一半的文件"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def dump_json(obj, indent: bool = True, sort_keys: bool = False) -> bytes:
+    """UTF-8 JSON；有orjson时用它，输出与标准库相同"""
+    if HAS_ORJSON:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, option=option)
+    return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None, sort_keys=sort_keys).encode('utf-8')
+
+
+def load_json(path: Path):
+    data = path.read_bytes()
+    return orjson.loads(data) if HAS_ORJSON else json.loads(data)
+
+
+# yaml 只在解析/写回 watchlist 时才导入；解析结果按 yaml 的 mtime+size 缓存成 pickle，
+# health/status 这类被频繁轮询的命令命中缓存时完全不碰 yaml
+_config_snapshot = None  # (watchlist stamp, 加载/保存时config的pickle)：save_config据此判断有没有改动，
+                         # 同一进程再次load_config时直接用它，不读盘
+
+
+def _watchlist_stamp(st: os.stat_result) -> tuple:
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _cache_config(config, st: os.stat_result):
+    try:
+        atomic_write(CONFIG_CACHE_PATH, pickle.dumps((_watchlist_stamp(st), config), pickle.HIGHEST_PROTOCOL))
+    except OSError:
+        pass
+
+
 def load_config():
-    if not WATCHLIST_PATH.exists():
+    global _config_snapshot
+    try:
+        st = WATCHLIST_PATH.stat()
+    except FileNotFoundError:
         print(f"Error: Config not found at {WATCHLIST_PATH}", file=sys.stderr)
         sys.exit(1)
-    with open(WATCHLIST_PATH, 'r') as f:
-        return yaml.safe_load(f)
+    stamp = _watchlist_stamp(st)
+    if _config_snapshot and _config_snapshot[0] == stamp:
+        return pickle.loads(_config_snapshot[1])  # 给调用方一份新拷贝，改了也不影响快照
+
+    config = None
+    try:
+        cached_stamp, cached = pickle.loads(CONFIG_CACHE_PATH.read_bytes())
+        if cached_stamp == stamp:
+            config = cached
+    except Exception:
+        pass  # 没有缓存或缓存坏了，重新解析
+    if config is None:
+        import yaml
+        with open(WATCHLIST_PATH, 'r') as f:
+            config = yaml.safe_load(f)
+        _cache_config(config, st)
+    _config_snapshot = (stamp, pickle.dumps(config, pickle.HIGHEST_PROTOCOL))
+    return config
 
 
 def save_config(config):
-    with open(WATCHLIST_PATH, 'w') as f:
-        yaml.dump(config, f, allow_unicode=True, default_flow_style=False, sort_keys=False)
+    """config与加载时相同就不重写yaml（也保留手写的注释和格式）"""
+    global _config_snapshot
+    snapshot = pickle.dumps(config, pickle.HIGHEST_PROTOCOL)
+    if _config_snapshot and snapshot == _config_snapshot[1] and WATCHLIST_PATH.exists():
+        return
+    import yaml
+    text = yaml.dump(config, allow_unicode=True, default_flow_style=False, sort_keys=False)
+    atomic_write(WATCHLIST_PATH, text.encode('utf-8'))
+    st = WATCHLIST_PATH.stat()
+    _cache_config(config, st)
+    _config_snapshot = (_watchlist_stamp(st), snapshot)
 
 
 def load_state():
     if STATE_PATH.exists():
-        with open(STATE_PATH, 'r') as f:
-            return json.load(f)
+        return load_json(STATE_PATH)
     return {"keyword_index": 0, "account_index": 0, "seen_posts": [], "last_run": None}
 
 
 def save_state(state):
-    STATE_PATH.parent.mkdir(parents=True, exist_ok=True)
-    with open(STATE_PATH, 'w') as f:
-        json.dump(state, f, indent=2)
+    atomic_write(STATE_PATH, dump_json(state))
 
 
 def load_metrics():
     """加载watchlist质量指标"""
     if METRICS_PATH.exists():
-        with open(METRICS_PATH, 'r') as f:
-            return json.load(f)
+        return load_json(METRICS_PATH)
     return {"accounts": {}, "keywords": {}, "last_maintain": None}
 
 
 def save_metrics(metrics):
-    with open(METRICS_PATH, 'w') as f:
-        json.dump(metrics, f, indent=2, ensure_ascii=False)
+    atomic_write(METRICS_PATH, dump_json(metrics))
+
+
+# ── x-api (in-process) ─────────────────────────────────────────
+# scout_x 本身就跑在 x-api 的 venv 里，直接 import x_api 复用同一个 OAuth session，
+# 不再为每次调用起一个解释器。首次调用时才导入，status/health 等命令用不到。
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
+_api_get = None
+
+
+class RateLimiter:
+    """按endpoint记录X返回的 x-rate-limit-remaining/reset，额度用完时等到窗口重置再发请求。
+
+    并发请求在发出前先扣本地额度，避免响应回来之前一起把额度用穿；
+    响应头通过 requests 的 response hook 拿到（x_api.api_get 只返回JSON）。
+    """
+
+    _BUCKET_SUBS = (
+        (re.compile(r'^users/by/username/[^/]+'), 'users/by/username/:username'),
+        (re.compile(r'/\d+(?=/|$)'), '/:id'),
+    )
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets = {}  # bucket -> {'limit', 'remaining', 'reset'}
+        self.local = threading.local()  # 本线程最近一次响应的状态码
+
+    @classmethod
+    def bucket(cls, path: str) -> str:
+        """'/2/users/123/tweets' → 'users/:id/tweets'（X的额度按endpoint算）"""
+        path = path.lstrip('/')
+        if path.startswith('2/'):
+            path = path[2:]
+        for pattern, repl in cls._BUCKET_SUBS:
+            path = pattern.sub(repl, path)
+        return path
+
+    def acquire(self, bucket: str):
+        announced = False
+        while True:
+            with self.lock:
+                b = self.buckets.get(bucket)
+                now = time.time()
+                if b is None:
+                    return
+                if b['reset'] <= now:
+                    if not b['limit']:
+                        del self.buckets[bucket]
+                        return
+                    # 窗口已重置：先按上限放行，真实的reset等响应头刷新
+                    b['remaining'], b['reset'] = b['limit'], now + RATE_LIMIT_WINDOW
+                if b['remaining'] > 0:
+                    b['remaining'] -= 1
+                    return
+                wait = b['reset'] - now
+            if not announced:
+                sys.stderr.write(f"  ⏳ {bucket} 额度用完，等待 {wait:.0f}s 到窗口重置\n")
+                announced = True
+            time.sleep(min(wait + 1, 5))  # 分段等：期间别的响应可能带回更准的reset
+
+    def record(self, response, *args, **kwargs):
+        """requests response hook"""
+        self.local.status = response.status_code
+        headers = response.headers
+        remaining, reset = headers.get('x-rate-limit-remaining'), headers.get('x-rate-limit-reset')
+        if response.status_code == 429:
+            remaining = 0
+            if reset is None:
+                retry_after = headers.get('retry-after')
+                reset = time.time() + (float(retry_after) if retry_after else RATE_LIMIT_RETRY_WAIT)
+        if remaining is None or reset is None:
+            return
+        with self.lock:
+            self.buckets[self.bucket(urlparse(response.url).path)] = {
+                'limit': int(headers.get('x-rate-limit-limit') or 0),
+                'remaining': int(remaining),
+                'reset': float(reset),
+            }
+
+    def limited(self) -> bool:
+        return getattr(self.local, 'status', None) == 429
+
+    def remaining(self, bucket: str) -> int | None:
+        """本地记录的剩余额度；没有记录或窗口已重置时返回None（额度未知）"""
+        with self.lock:
+            b = self.buckets.get(bucket)
+            if b is None or b['reset'] <= time.time():
+                return None
+            return b['remaining']
+
+    def snapshot(self) -> dict:
+        now = time.time()
+        with self.lock:
+            return {k: dict(v) for k, v in self.buckets.items() if v['reset'] > now}
+
+    def load(self, path: Path):
+        try:
+            self.buckets.update(load_json(path))
+        except (OSError, ValueError):
+            pass
+
+
+rate_limiter = RateLimiter()
+
+
+def _mount_http_pool(session):
+    """给OAuth session挂一个够大的连接池：并发请求复用TCP/TLS连接，
+    连接/读超时这类瞬时网络错误自动重试（429由RateLimiter处理）"""
+    try:
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+    except ImportError:
+        return
+    retry_kwargs = dict(total=2, connect=2, read=2, status=0, backoff_factor=0.5,
+                        allowed_methods=frozenset({'GET'}), raise_on_status=False)
+    try:
+        retry = Retry(backoff_jitter=0.5, **retry_kwargs)
+    except TypeError:  # urllib3 < 2 没有 backoff_jitter
+        retry = Retry(**retry_kwargs)
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+    session.mount('https://', adapter)
+
+
+def _x_session():
+    global _SESSION, _api_get
+    if _SESSION is None:
+        with _SESSION_LOCK:  # 并发请求时只建一次
+            if _SESSION is None:
+                sys.path.insert(0, str(X_API_SCRIPT.parent))
+                from x_api import api_get, get_oauth1_session
+                _api_get = api_get
+                session = get_oauth1_session()
+                if hasattr(session, 'mount'):
+                    _mount_http_pool(session)
+                if hasattr(session, 'hooks'):
+                    session.hooks['response'].append(rate_limiter.record)
+                rate_limiter.load(RATE_LIMITS_PATH)  # 上次运行留下的额度信息
+                _SESSION = session
+    return _SESSION
+
+
+def _x_get(path: str, params: dict | None = None) -> dict | None:
+    session = _x_session()
+    bucket = RateLimiter.bucket(path)
+    for attempt in range(2):  # 429 时等窗口重置后重试一次
+        rate_limiter.acquire(bucket)
+        rate_limiter.local.status = None
+        try:
+            data = _api_get(session, path, params=params or {})
+        except Exception:
+            if rate_limiter.limited() and attempt == 0:
+                continue
+            raise
+        if not rate_limiter.limited():
+            break
+    return data
+
+
+def save_rate_limits():
+    """把各endpoint剩余额度存盘，供下次运行和 health 使用"""
+    limits = rate_limiter.snapshot()
+    if limits:
+        atomic_write(RATE_LIMITS_PATH, dump_json(limits, sort_keys=True))
+
+
+def _x_search(query: str, max_results: int = 10, sort_order: str = 'relevancy') -> dict | None:
+    return _x_get('/tweets/search/recent', {
+        'query': query,
+        'max_results': max(10, min(100, max_results)),
+        'sort_order': sort_order,
+        'tweet.fields': TWEET_FIELDS,
+    })
 
 
-# ── helpers ────────────────────────────────────────────────────
-def call_x_api(*args, timeout=60):
-    """调用x-api脚本，返回parsed JSON或None"""
-    cmd = [str(X_API_VENV), str(X_API_SCRIPT)] + list(args)
-    try:
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
-        if result.returncode != 0:
-            err = result.stderr.strip()
-            if err:
-                print(f"  ⚠ X API error: {err[:200]}", file=sys.stderr)
-            return None
-        return json.loads(result.stdout) if result.stdout.strip() else None
-    except subprocess.TimeoutExpired:
-        print("  ⚠ X API timeout", file=sys.stderr)
-        return None
-    except json.JSONDecodeError:
+def _x_user_posts(username: str, max_results: int = 5, exclude: tuple = ('replies', 'retweets'),
+                  user_id: str | None = None, since_id: str | None = None) -> dict | None:
+    """用户最近的推文；已知user_id（见resolve_user_ids）时省掉一次用户名查询，
+    给了since_id只返回比它新的"""
+    if not user_id:
+        user = _x_get(f'/users/by/username/{username}')
+        user_id = (user or {}).get('data', {}).get('id')
+    if not user_id:
         return None
+    params = {
+        'max_results': max(5, min(100, max_results)),
+        'exclude': ','.join(exclude),
+        'tweet.fields': TWEET_FIELDS,
+    }
+    if since_id:
+        params['since_id'] = since_id
+    return _x_get(f'/users/{user_id}/tweets', params)
 
 
-def call_x_api_user_by_id(user_id: str) -> dict | None:
-    """通过X API的/users/:id端点解析用户ID为用户名。
-    使用x_api.py的OAuth session，直接调用API。"""
-    # Build a small inline script that reuses x_api's session
-    script = f"""
-import sys
-sys.path.insert(0, '{X_API_SCRIPT.parent}')
-from x_api import get_oauth1_session, api_get
-import json
-session = get_oauth1_session()
-data = api_get(session, '/users/{user_id}', params={{'user.fields': 'id,username,name,description,public_metrics'}})
-if data and 'data' in data:
-    print(json.dumps(data['data']))
-"""
-    try:
-        result = subprocess.run(
-            [str(X_API_VENV), '-c', script],
-            capture_output=True, text=True, timeout=30
-        )
-        if result.returncode == 0 and result.stdout.strip():
-            return json.loads(result.stdout)
-    except Exception:
-        pass
-    return None
+def _x_thread(conversation_id: str, author: str | None = None, max_results: int = 100) -> dict | None:
+    """作者在该conversation里的所有推文（thread头 + 自己的续推），按时间正序"""
+    query = f'conversation_id:{conversation_id}'
+    if author:
+        query += f' from:{author}'
+    data = _x_get('/tweets/search/recent', {
+        'query': query,
+        'max_results': max(10, min(100, max_results)),
+        'tweet.fields': TWEET_FIELDS,
+    })
+    replies = (data or {}).get('data', [])
+    tweets = []
+    if replies:
+        # 搜索结果不含thread头，有续推时才补拉一次
+        root = _x_get(f'/tweets/{conversation_id}', {'tweet.fields': TWEET_FIELDS})
+        if root and 'data' in root:
+            tweets.append(root['data'])
+        # tweet ID是递增的数字串，按(长度, 字符串)排即时间顺序
+        tweets.extend(sorted(replies, key=lambda t: (len(t.get('id', '')), t.get('id', ''))))
+    return {'data': tweets, 'meta': {'conversation_id': conversation_id, 'author': author}}
+
+
+def _x_users_by_ids(user_ids: list) -> dict | None:
+    return _x_get('/users', {'ids': ','.join(user_ids), 'user.fields': USER_FIELDS})
 
 
-def collect_tier2_accounts(accounts: dict) -> list:
-    """收集所有tier2_*子组的账号"""
-    result = []
-    for key, val in accounts.items():
-        if key.startswith("tier2") and isinstance(val, list):
-            result.extend(val)
-    return result
+def _x_users_by_usernames(usernames: list) -> dict | None:
+    return _x_get('/users/by', {'usernames': ','.join(usernames), 'user.fields': USER_FIELDS})
 
 
-def find_account_tier(accounts: dict, username: str) -> str | None:
-    """找到账号所在的tier"""
-    for key, val in accounts.items():
-        if isinstance(val, list) and username in val:
-            return key
-    return None
+X_API_COMMANDS = {
+    'search': _x_search,
+    'user-posts': _x_user_posts,
+    'thread': _x_thread,
+    'users': _x_users_by_ids,
+    'users-by': _x_users_by_usernames,
+}
+
+
+# ── helpers ────────────────────────────────────────────────────
+def call_x_api(command: str, *args, **kwargs) -> dict | None:
+    """调用x-api（见X_API_COMMANDS），返回parsed JSON或None"""
+    try:
+        return X_API_COMMANDS[command](*args, **kwargs)
+    except Exception as e:
+        print(f"  ⚠ X API error: {str(e)[:200]}", file=sys.stderr)
+        return None
+
+
+def _load_users_cache() -> dict:
+    try:
+        return load_json(USERS_CACHE_PATH)
+    except (OSError, ValueError):
+        return {}
+
+
+def _cache_users(cache: dict, users: list):
+    """把API返回的用户记进 cache/users.json（{id: {username, name, cached_at}}）"""
+    now = time.time()
+    for user in users:
+        if user.get('id') and user.get('username'):
+            cache[str(user['id'])] = {'username': user['username'], 'name': user.get('name', ''), 'cached_at': now}
+    atomic_write(USERS_CACHE_PATH, dump_json(cache, sort_keys=True))
+
+
+def call_x_api_users_by_ids(user_ids: list) -> dict:
+    """批量解析用户ID（/users?ids=，每批100个），返回 {id: user}；一周内查过的直接用缓存"""
+    cache = _load_users_cache()
+    cutoff = time.time() - USERS_CACHE_TTL
+    users = {}
+    missing = []
+    for uid in user_ids:
+        hit = cache.get(str(uid))
+        if hit and hit.get('cached_at', 0) > cutoff:
+            users[str(uid)] = {'id': str(uid), 'username': hit['username'], 'name': hit.get('name', '')}
+        else:
+            missing.append(uid)
+    fetched = []
+    for i in range(0, len(missing), USERS_BATCH):
+        data = call_x_api('users', missing[i:i + USERS_BATCH])
+        fetched.extend((data or {}).get('data', []))
+    for user in fetched:
+        users[str(user.get('id'))] = user
+    if fetched:
+        _cache_users(cache, fetched)
+    return users
+
+
+def resolve_user_ids(usernames: list) -> dict:
+    """用户名 → user ID。和 call_x_api_users_by_ids 共用 cache/users.json 及其TTL，只批量查缺的"""
+    cache = _load_users_cache()
+    cutoff = time.time() - USERS_CACHE_TTL
+    # 按缓存时间排序，改名后旧用户名被别人占用时以最新记录为准
+    ids = {
+        entry['username'].lower(): uid
+        for uid, entry in sorted(cache.items(), key=lambda kv: kv[1].get('cached_at', 0))
+        if entry.get('cached_at', 0) > cutoff
+    }
+    missing = sorted({u.lower() for u in usernames} - ids.keys())
+    fetched = []
+    for i in range(0, len(missing), USERS_BATCH):
+        data = call_x_api('users-by', missing[i:i + USERS_BATCH])
+        fetched.extend((data or {}).get('data', []))
+    for user in fetched:
+        ids[user['username'].lower()] = str(user['id'])
+    if fetched:
+        _cache_users(cache, fetched)
+    return {u: ids.get(u.lower()) for u in usernames}
+
+
+def parallel_workers(config: dict) -> int:
+    """并发请求数，schedule.parallel_workers 可调（默认8）"""
+    return max(1, int(config.get('schedule', {}).get('parallel_workers', 8)))
+
+
+def thread_pool(config: dict):
+    """请求线程池。concurrent.futures 连带 logging 等导入要好几毫秒，
+    只有真正发请求的命令才导入，status/health 等不用付这个启动成本"""
+    from concurrent.futures import ThreadPoolExecutor
+    return ThreadPoolExecutor(max_workers=parallel_workers(config))
+
+
+def tier2_groups(accounts: dict) -> dict:
+    """tier2_*子组 → 账号列表（按配置顺序）；tier2的判断只在这里做"""
+    return {key: val for key, val in accounts.items() if key.startswith("tier2") and isinstance(val, list)}
+
+
+def collect_tier2_accounts(accounts: dict, groups: dict | None = None) -> list:
+    """收集所有tier2_*子组的账号；已经有tier2_groups结果时传进来，不再扫一遍"""
+    if groups is None:
+        groups = tier2_groups(accounts)
+    return list(chain.from_iterable(groups.values()))
+
+
+def build_tier_index(accounts: dict) -> dict:
+    """账号 → 所在tier（出现在多个tier时取第一个）；每个命令建一次，之后O(1)查询"""
+    index = {}
+    for tier, members in accounts.items():
+        if isinstance(members, list):
+            for username in members:
+                index.setdefault(str(username), tier)
+    return index
+
+
+@functools.lru_cache(maxsize=8)
+def _exclude_matcher(exclude_keywords: tuple):
+    """exclude关键词的匹配器（按关键词元组缓存，配置改了自动重建）。
+
+    有pyahocorasick时编译成Aho-Corasick自动机，一次扫描全文；否则逐个子串查找
+    （关键词预先转好小写）。几十个关键词时CPython的子串查找比正则多选分支快。
+    """
+    keywords = tuple(dict.fromkeys(kw.lower() for kw in exclude_keywords if kw))
+    if not keywords:
+        return lambda text: False
+    if HAS_AHOCORASICK:
+        automaton = ahocorasick.Automaton()
+        for kw in keywords:
+            automaton.add_word(kw, kw)
+        automaton.make_automaton()
+        return lambda text: next(automaton.iter(text), None) is not None
+    return lambda text: any(kw in text for kw in keywords)
 
 
 def matches_exclude(text: str, exclude_keywords: list) -> bool:
     if not exclude_keywords:
         return False
-    text_lower = text.lower()
-    return any(kw.lower() in text_lower for kw in exclude_keywords)
+    return _exclude_matcher(tuple(exclude_keywords))(text.lower())
 
 
 def format_post(post: dict) -> str:
     metrics = post.get('metrics', {})
-    likes = metrics.get('like_count', 0)
-    rts = metrics.get('retweet_count', 0)
     views = metrics.get('impression_count', 0)
-    source = post.get('source', '')
     author = post.get('author', '')
-    text = post.get('text', '').strip()
-    pid = post.get('id', '')
     thread = post.get('thread')
 
-    lines = []
-    header = f"### {source}"
-    if author:
-        header += f" — @{author}"
-    if thread:
-        header += f" 🧵 ({thread['length']} tweets)"
-    lines.append(header)
-    lines.append("")
-
+    by = f" — @{author}" if author else ""
     if thread:
         # Render full thread
-        for i, t in enumerate(thread.get('tweets', []), 1):
-            lines.append(f"**[{i}/{thread['length']}]**")
-            lines.append(t.get('text', '').strip())
-            lines.append("")
+        n = thread['length']
+        header = f"{by} 🧵 ({n} tweets)"
+        body = "".join(f"**[{i}/{n}]**\n{t.get('text', '').strip()}\n\n"
+                       for i, t in enumerate(thread.get('tweets', []), 1))
+        conv = f"  | conv: {thread.get('conversation_id', '')}"
     else:
-        lines.append(text)
-        lines.append("")
+        header = by
+        body = f"{post.get('text', '').strip()}\n\n"
+        conv = ""
+    seen = f"  👁 {views}" if views else ""
 
-    stats = f"❤️ {likes}  🔁 {rts}"
-    if views:
-        stats += f"  👁 {views}"
-    stats += f"  | ID: {pid}"
-    if thread:
-        stats += f"  | conv: {thread.get('conversation_id', '')}"
-    lines.append(stats)
-    lines.append("")
-    lines.append("---")
-    lines.append("")
-    return "\n".join(lines)
+    return (f"### {post.get('source', '')}{header}\n\n{body}"
+            f"❤️ {metrics.get('like_count', 0)}  🔁 {metrics.get('retweet_count', 0)}{seen}"
+            f"  | ID: {post.get('id', '')}{conv}\n\n---\n")
+
+
+def _thread_cache_fresh(thread: dict | None, age: float) -> bool:
+    if age < THREAD_CACHE_TTL:
+        return True
+    if not thread:
+        return False
+    last = max(t.get('created_at', '') for t in thread.get('tweets', [{}]))
+    try:
+        last_dt = datetime.fromisoformat(last.replace('Z', '+00:00'))
+    except ValueError:
+        return False
+    return datetime.now(timezone.utc) - last_dt > SEARCH_WINDOW
 
 
 def fetch_thread(conversation_id: str, author: str) -> dict | None:
-    """拉取完整thread内容"""
-    data = call_x_api('thread', conversation_id, '--max-results', '100')
-    if not data or 'data' not in data:
-        return None
-    tweets = data['data']
-    if len(tweets) <= 1:
-        return None  # 不是真正的thread
-    return {
-        'conversation_id': data.get('meta', {}).get('conversation_id', conversation_id),
-        'author': data.get('meta', {}).get('author', author),
-        'length': len(tweets),
-        'tweets': tweets,
-    }
+    """拉取完整thread内容（不是thread时返回None，结果按conversation_id缓存到磁盘）"""
+    cache_path = THREAD_CACHE_DIR / f"{conversation_id}.json"
+    if thread_cache_enabled:
+        try:
+            cached = load_json(cache_path)
+            if _thread_cache_fresh(cached['thread'], time.time() - cache_path.stat().st_mtime):
+                return cached['thread']
+        except (OSError, ValueError, KeyError):
+            pass
+
+    data = call_x_api('thread', conversation_id, author)
+    if data is None:
+        return None  # 请求失败不缓存
+    tweets = data.get('data', [])
+    thread = None
+    if len(tweets) > 1:  # 只有1条就不是真正的thread
+        thread = {
+            'conversation_id': data.get('meta', {}).get('conversation_id', conversation_id),
+            'author': data.get('meta', {}).get('author', author),
+            'length': len(tweets),
+            'tweets': tweets,
+        }
+    if thread_cache_enabled:
+        atomic_write(cache_path, dump_json({'thread': thread}, indent=False))
+    return thread
 
 
 # ── metrics tracking ──────────────────────────────────────────
-def update_account_metrics(metrics: dict, account: str, posts: list):
+def update_account_metrics(metrics: dict, account: str, posts: list, now_iso: str | None = None):
     """更新账号的质量指标"""
     am = metrics.setdefault("accounts", {}).setdefault(account, {
         "total_posts": 0,
@@ -206,12 +610,11 @@ def update_account_metrics(metrics: dict, account: str, posts: list):
     })
     if posts:
         am["hits"] += 1
-        am["last_seen"] = datetime.now().isoformat()
-        for p in posts:
-            m = p.get("metrics", {})
-            am["total_posts"] += 1
-            am["total_likes"] += m.get("like_count", 0)
-            am["total_rts"] += m.get("retweet_count", 0)
+        am["last_seen"] = now_iso or datetime.now().isoformat()
+        stats = [p.get("metrics", {}) for p in posts]
+        am["total_posts"] += len(stats)
+        am["total_likes"] += sum(m.get("like_count", 0) for m in stats)
+        am["total_rts"] += sum(m.get("retweet_count", 0) for m in stats)
         if am["total_posts"] > 0:
             am["avg_engagement"] = round(
                 (am["total_likes"] + am["total_rts"] * 3) / am["total_posts"]
@@ -220,7 +623,7 @@ def update_account_metrics(metrics: dict, account: str, posts: list):
         am["misses"] += 1
 
 
-def update_keyword_metrics(metrics: dict, keyword: str, posts: list):
+def update_keyword_metrics(metrics: dict, keyword: str, posts: list, now_iso: str | None = None):
     """更新关键词的质量指标"""
     km = metrics.setdefault("keywords", {}).setdefault(keyword, {
         "searches": 0,
@@ -231,21 +634,104 @@ def update_keyword_metrics(metrics: dict, keyword: str, posts: list):
         "last_searched": None,
     })
     km["searches"] += 1
-    km["last_searched"] = datetime.now().isoformat()
+    km["last_searched"] = now_iso or datetime.now().isoformat()
     km["total_results"] += len(posts)
-    for p in posts:
-        km["total_likes"] += p.get("metrics", {}).get("like_count", 0)
+    km["total_likes"] += sum(p.get("metrics", {}).get("like_count", 0) for p in posts)
     if km["searches"] > 0:
         km["avg_results"] = round(km["total_results"] / km["searches"], 1)
     if km["total_results"] > 0:
         km["avg_engagement"] = round(km["total_likes"] / km["total_results"])
 
 
+# ── seen posts ─────────────────────────────────────────────────
+SEEN_RECENT = 500          # 精确保存最近的post ID（state['seen_posts']）
+SEEN_BLOOM_CAPACITY = 50_000
+SEEN_BLOOM_FP_RATE = 0.01
+SEEN_BLOOM_ROTATE_DAYS = 7  # 两个filter轮换：覆盖最近7~14天
+
+
+class BloomFilter:
+    """定长bloom filter（bit数组 + k个哈希位置），只用标准库"""
+
+    def __init__(self, capacity=SEEN_BLOOM_CAPACITY, fp_rate=SEEN_BLOOM_FP_RATE, bits=None):
+        self.size = math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2)
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bits if bits is not None else bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item: str):
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+    def dumps(self) -> str:
+        return base64.b64encode(zlib.compress(bytes(self.bits))).decode('ascii')
+
+    @classmethod
+    def loads(cls, data: str) -> 'BloomFilter':
+        bf = cls()
+        bits = bytearray(zlib.decompress(base64.b64decode(data)))
+        if len(bits) == len(bf.bits):  # 容量参数改过就作废旧filter
+            bf.bits = bits
+        return bf
+
+
+class SeenPosts:
+    """已见post ID：最近SEEN_RECENT个按插入顺序精确保存，更早的由两个轮换的bloom filter记住。
+
+    bloom误判只会让一条新post被当成见过而跳过，对巡逻无害。
+    """
+
+    def __init__(self, state: dict, now: datetime | None = None):
+        now = now or datetime.now()
+        seen_posts = state.get('seen_posts', [])
+        self.recent = deque(seen_posts, maxlen=SEEN_RECENT)
+        self._recent_set = set(self.recent)
+        bloom = state.get('seen_bloom') or {}
+        self.current = BloomFilter.loads(bloom['current']) if bloom.get('current') else BloomFilter()
+        self.previous = BloomFilter.loads(bloom['previous']) if bloom.get('previous') else None
+        self.rotated_at = bloom.get('rotated_at') or now.isoformat()
+        if now - datetime.fromisoformat(self.rotated_at) >= timedelta(days=SEEN_BLOOM_ROTATE_DAYS):
+            self.previous, self.current = self.current, BloomFilter()
+            self.rotated_at = now.isoformat()
+        for pid in seen_posts:  # 旧state只有seen_posts列表
+            self.current.add(pid)
+
+    def __contains__(self, pid: str) -> bool:
+        if not pid:
+            return False
+        return (pid in self._recent_set or pid in self.current
+                or (self.previous is not None and pid in self.previous))
+
+    def add(self, pid: str):
+        if not pid or pid in self._recent_set:
+            return
+        if len(self.recent) == self.recent.maxlen:
+            self._recent_set.discard(self.recent[0])
+        self.recent.append(pid)
+        self._recent_set.add(pid)
+        self.current.add(pid)
+
+    def save(self, state: dict):
+        state['seen_posts'] = list(self.recent)
+        state['seen_bloom'] = {
+            'current': self.current.dumps(),
+            'previous': self.previous.dumps() if self.previous is not None else None,
+            'rotated_at': self.rotated_at,
+        }
+
+
 # ── core patrol logic ──────────────────────────────────────────
-def search_keywords(config, state, metrics=None, force_all=False):
+def submit_keyword_searches(config, state, pool, force_all=False) -> list:
+    """选出本轮关键词并把搜索请求提交到pool，返回 [(keyword, future)]"""
     keywords = config.get('keywords', {})
     schedule = config.get('schedule', {})
-    exclude = config.get('filters', {}).get('exclude_keywords', [])
 
     to_search = list(keywords.get('core', []))
 
@@ -259,13 +745,29 @@ def search_keywords(config, state, metrics=None, force_all=False):
     elif force_all:
         to_search.extend(trending)
 
-    seen = set(state.get('seen_posts', []))
-    results = []
-
+    pending = []
     for kw in to_search:
         print(f"🔍 Searching: {kw}")
         query = f"{kw} -is:retweet lang:en"
-        data = call_x_api('search', query, '--max-results', '10', '--sort-order', 'relevancy')
+        pending.append((kw, pool.submit(call_x_api, 'search', query, max_results=10, sort_order='relevancy')))
+    return pending
+
+
+def search_keywords(config, state, metrics=None, force_all=False, now=None, pending=None):
+    """pending 为 submit_keyword_searches 已提交的请求；不给时自己选词、发请求"""
+    if pending is None:
+        with thread_pool(config) as pool:
+            pending = submit_keyword_searches(config, state, pool, force_all)
+            return search_keywords(config, state, metrics, force_all, now, pending)
+
+    now = now or datetime.now()
+    exclude = config.get('filters', {}).get('exclude_keywords', [])
+    seen = SeenPosts(state, now)
+    results = []
+
+    # 请求并发发出，结果仍按关键词顺序处理（去重、指标与串行时一致）
+    for kw, future in pending:
+        data = future.result()
         kw_posts = []
         if data and 'data' in data:
             for post in data['data']:
@@ -286,16 +788,16 @@ def search_keywords(config, state, metrics=None, force_all=False):
                 results.append(p)
                 seen.add(pid)
         if metrics is not None:
-            update_keyword_metrics(metrics, kw, kw_posts)
+            update_keyword_metrics(metrics, kw, kw_posts, now.isoformat())
 
-    state['seen_posts'] = list(seen)[-500:]
+    seen.save(state)
     return results
 
 
-def fetch_accounts(config, state, metrics=None, force_all=False):
+def submit_account_fetches(config, state, pool, force_all=False) -> list:
+    """选出本轮账号并把时间线请求提交到pool，返回 [(account, future)]"""
     accounts = config.get('accounts', {})
     schedule = config.get('schedule', {})
-    exclude = config.get('filters', {}).get('exclude_keywords', [])
 
     to_fetch = list(accounts.get('tier1', []))
 
@@ -309,16 +811,63 @@ def fetch_accounts(config, state, metrics=None, force_all=False):
     elif force_all:
         to_fetch.extend(tier2_all)
 
-    seen = set(state.get('seen_posts', []))
-    results = []
-
-    seen_convs = set()  # 已拉取的 conversation_id，避免重复拉thread
+    user_ids = resolve_user_ids(to_fetch)
+    # 每个账号上次见过的最新推文ID，时间线只要比它新的（见 state['user_since']）
+    user_since = state.get('user_since', {})
 
+    pending = []
     for account in to_fetch:
         print(f"👤 Fetching: @{account}")
-        data = call_x_api('user-posts', account, '--max-results', '5', '--exclude', 'replies', 'retweets')
+        pending.append((account, pool.submit(
+            call_x_api, 'user-posts', account,
+            max_results=5, exclude=('replies', 'retweets'), user_id=user_ids.get(account),
+            since_id=user_since.get(account),
+        )))
+    return pending
+
+
+def fetch_accounts(config, state, metrics=None, force_all=False, now=None, pool=None, pending=None):
+    """pending 为 submit_account_fetches 已提交到 pool 的请求；都不给时自己建pool、发请求"""
+    if pool is None:
+        with thread_pool(config) as pool:
+            return fetch_accounts(config, state, metrics, force_all, now, pool, pending)
+    if pending is None:
+        pending = submit_account_fetches(config, state, pool, force_all)
+
+    now = now or datetime.now()
+    exclude = config.get('filters', {}).get('exclude_keywords', [])
+    seen = SeenPosts(state, now)
+    results = []
+
+    seen_convs = set()  # 已拉取的 conversation_id，避免重复拉thread
+    user_since = state.setdefault('user_since', {})
+
+    to_fetch = [account for account, _ in pending]
+    responses = [future.result() for _, future in pending]
+
+    # thread并发预取，只取下面的串行处理本来就会拉的：按同样顺序过 seen/exclude，
+    # 本轮已保留的post也算见过（thread里其余tweet和thread头同一conversation，不会多拉）。
+    # thread走search接口，预取数不超过该endpoint剩余额度，超出的留到串行处理时再拉
+    wanted = {}  # conversation_id -> account，按处理顺序
+    kept = set()
+    for account, data in zip(to_fetch, responses):
+        for post in (data or {}).get('data', []):
+            pid, conv_id = post.get('id'), post.get('conversation_id')
+            if not pid or pid in seen or pid in kept or matches_exclude(post.get('text', ''), exclude):
+                continue
+            kept.add(pid)
+            if conv_id:
+                wanted.setdefault(conv_id, account)
+    budget = rate_limiter.remaining(RateLimiter.bucket('/tweets/search/recent'))
+    threads = {conv_id: pool.submit(fetch_thread, conv_id, account)
+               for conv_id, account in list(wanted.items())[:budget]}
+
+    for account, data in zip(to_fetch, responses):
         acc_posts = []
         if data and 'data' in data:
+            ids = [str(post['id']) for post in data['data'] if post.get('id')]
+            if ids:
+                user_since[account] = max(ids + [user_since.get(account, '')], key=lambda i: (len(i), i))
             for post in data['data']:
                 pid = post.get('id')
                 if not pid or pid in seen:
@@ -346,7 +895,8 @@ def fetch_accounts(config, state, metrics=None, force_all=False):
                 # 我们直接尝试拉取，如果只有1条就不是thread
                 if conv_id and conv_id not in seen_convs:
                     seen_convs.add(conv_id)
-                    thread = fetch_thread(conv_id, account)
+                    future = threads.get(conv_id)
+                    thread = future.result() if future else fetch_thread(conv_id, account)
                     if thread:
                         p['thread'] = thread
                         # 把thread里所有tweet id加入seen
@@ -358,9 +908,9 @@ def fetch_accounts(config, state, metrics=None, force_all=False):
                 results.append(p)
                 seen.add(pid)
         if metrics is not None:
-            update_account_metrics(metrics, account, acc_posts)
+            update_account_metrics(metrics, account, acc_posts, now.isoformat())
 
-    state['seen_posts'] = list(seen)[-500:]
+    seen.save(state)
     return results
 
 
@@ -373,58 +923,55 @@ def check_discovery(results, config):
     min_rts = discovery.get('min_retweets', 200)
     max_disc = discovery.get('max_discovered', 20)
 
-    all_known = set()
-    for key, val in config.get('accounts', {}).items():
-        if isinstance(val, list):
-            all_known.update(str(v) for v in val)
+    all_known = set(build_tier_index(config.get('accounts', {})))
 
     discovered = config.setdefault('accounts', {}).setdefault('discovered', [])
 
     for post in results:
         m = post.get('metrics', {})
-        author = post.get('author') or post.get('author_id')
-        if not author or str(author) in all_known:
+        author = str(post.get('author') or post.get('author_id') or '')
+        if not author or author in all_known:
             continue
         if m.get('like_count', 0) >= min_likes or m.get('retweet_count', 0) >= min_rts:
             print(f"🆕 Discovered: {author}")
-            discovered.append(str(author))
-            all_known.add(str(author))
+            discovered.append(author)
+            all_known.add(author)
 
     if len(discovered) > max_disc:
         config['accounts']['discovered'] = discovered[-max_disc:]
 
 
 # ── output ─────────────────────────────────────────────────────
-def save_results(results, patrol_type="patrol"):
+def save_results(results, patrol_type="patrol", now=None):
     if not results:
         print("No new posts to save")
         return None
 
     RAW_DIR.mkdir(parents=True, exist_ok=True)
-    date_str = datetime.now().strftime("%Y-%m-%d")
-    time_str = datetime.now().strftime("%H:%M")
+    now = now or datetime.now()
+    date_str = now.strftime("%Y-%m-%d")
+    time_str = now.strftime("%H:%M")
     filepath = RAW_DIR / f"{date_str}_{patrol_type}.md"
 
     mode = 'a' if filepath.exists() else 'w'
-    with open(filepath, mode) as f:
-        if mode == 'w':
-            f.write(f"# X Patrol - {date_str}\n\n")
-        f.write(f"\n## {time_str} — {len(results)} posts\n\n")
-        for post in results:
-            f.write(format_post(post))
+    # 整段先拼好，一次write
+    parts = [f"# X Patrol - {date_str}\n\n"] if mode == 'w' else []
+    parts.append(f"\n## {time_str} — {len(results)} posts\n\n")
+    parts.extend(format_post(post) for post in results)
+    with open(filepath, mode, encoding='utf-8') as f:
+        f.write("".join(parts))
 
     print(f"✅ Saved {len(results)} posts → {filepath.name}")
     return str(filepath)
 
 
-def print_json_summary(results):
+def print_json_summary(results, now=None):
+    top = heapq.nlargest(10, results, key=lambda p: p.get('metrics', {}).get('like_count', 0))
     summary = {
         "total": len(results),
-        "timestamp": datetime.now().isoformat(),
-        "top_posts": sorted(results, key=lambda p: p.get('metrics', {}).get('like_count', 0), reverse=True)[:10],
+        "timestamp": (now or datetime.now()).isoformat(),
+        "top_posts": [{**p, 'text': p['text'][:280]} for p in top],  # 截断副本，不改调用方的results
     }
-    for p in summary["top_posts"]:
-        p['text'] = p['text'][:280]
     print(json.dumps(summary, ensure_ascii=False, indent=2))
 
 
@@ -438,14 +985,15 @@ def cmd_maintain(args, config):
     if not am and not km:
         print("⚠ 没有指标数据（需要跑几次patrol积累）。跳过质量分析，执行ID解析...\n")
 
+    now = datetime.now()
     report = {
-        "timestamp": datetime.now().isoformat(),
+        "timestamp": now.isoformat(),
         "actions_taken": [],
         "suggestions": [],
     }
 
     accounts = config.get('accounts', {})
-    all_tier2 = collect_tier2_accounts(accounts)
+    tier_index = build_tier_index(accounts)
 
     # ── 1. 识别低效账号 ──
     print("\n📊 账号质量分析:")
@@ -460,7 +1008,7 @@ def cmd_maintain(args, config):
 
         hit_rate = data["hits"] / total if total > 0 else 0
         avg_eng = data.get("avg_engagement", 0)
-        tier = find_account_tier(accounts, acct)
+        tier = tier_index.get(acct)
 
         if data["misses"] >= 5 and hit_rate < 0.2:
             dead_accounts.append((acct, tier, hit_rate, data["misses"]))
@@ -536,19 +1084,22 @@ def cmd_maintain(args, config):
 
     # ── 3. Discovered → 解析用户名 ──
     discovered = accounts.get('discovered', [])
-    id_entries = [d for d in discovered if d.isdigit()]
+    id_positions = defaultdict(list)  # uid → 在discovered里的下标，替换时不用再index()扫描
+    for i, d in enumerate(discovered):
+        if d.isdigit():
+            id_positions[d].append(i)
+    id_entries = list(id_positions)
     if id_entries:
         print(f"\n  🔍 解析 {len(id_entries)} 个 discovered user IDs...")
         resolved = 0
-        for uid in id_entries[:5]:  # 每次最多解析5个，控制API调用
-            # get-user expects username, so use get-post trick: look up via user-posts
-            # Actually, use the X API /users/:id endpoint via a direct call
-            data = call_x_api_user_by_id(uid)
+        users = call_x_api_users_by_ids(id_entries)  # 每100个一次请求
+        for uid in id_entries:
+            data = users.get(uid)
             if data:
                 username = data.get('username')
                 if username:
-                    idx = discovered.index(uid)
-                    discovered[idx] = username
+                    for idx in id_positions[uid]:
+                        discovered[idx] = username
                     resolved += 1
                     print(f"     {uid} → @{username}")
                     report["actions_taken"].append({
@@ -584,7 +1135,7 @@ def cmd_maintain(args, config):
             print(f"\n💡 运行 `maintain --apply` 自动清理沉默账号")
 
     # ── 5. 保存维护报告 ──
-    metrics["last_maintain"] = datetime.now().isoformat()
+    metrics["last_maintain"] = now.isoformat()
     save_metrics(metrics)
 
     # 输出JSON报告（供agent消费）
@@ -604,10 +1155,7 @@ def cmd_health(args, config):
 
     # 计算覆盖率
     am = metrics.get("accounts", {})
-    tracked = set()
-    for key, val in accounts.items():
-        if isinstance(val, list):
-            tracked.update(val)
+    tracked = build_tier_index(accounts).keys()
 
     covered = set(am.keys()) & tracked
     coverage = len(covered) / len(tracked) if tracked else 0
@@ -637,6 +1185,21 @@ def cmd_health(args, config):
         ).days >= 3 if metrics.get("last_maintain") else True,
     }
 
+    # 上次运行记录的X API额度（还没到重置时间的endpoint）
+    try:
+        limits = load_json(RATE_LIMITS_PATH)
+    except (OSError, ValueError):
+        limits = {}
+    now = time.time()
+    health["rate_limits"] = {
+        bucket: {
+            "remaining": v["remaining"],
+            "limit": v["limit"],
+            "reset": datetime.fromtimestamp(v["reset"]).isoformat(timespec="seconds"),
+        }
+        for bucket, v in sorted(limits.items()) if v["reset"] > now
+    }
+
     print(json.dumps(health, ensure_ascii=False, indent=2))
     return health
 
@@ -647,14 +1210,20 @@ def cmd_patrol(args, config):
     metrics = load_metrics()
     print("🚀 Starting X patrol...\n")
 
-    kw_results = search_keywords(config, state, metrics)
-    acc_results = fetch_accounts(config, state, metrics)
+    now = datetime.now()  # 本次巡逻的时间：指标、结果文件、last_run 都用它
+    with thread_pool(config) as pool:
+        # 关键词和账号的请求一起发出，两段网络等待重叠；
+        # 处理仍是先关键词后账号，去重顺序与分开跑时一致
+        kw_pending = submit_keyword_searches(config, state, pool)
+        acc_pending = submit_account_fetches(config, state, pool)
+        kw_results = search_keywords(config, state, metrics, now=now, pending=kw_pending)
+        acc_results = fetch_accounts(config, state, metrics, now=now, pool=pool, pending=acc_pending)
     all_results = kw_results + acc_results
 
-    filepath = save_results(all_results)
+    filepath = save_results(all_results, now=now)
     check_discovery(all_results, config)
 
-    state['last_run'] = datetime.now().isoformat()
+    state['last_run'] = now.isoformat()
     save_state(state)
     save_config(config)
     save_metrics(metrics)
@@ -663,7 +1232,7 @@ def cmd_patrol(args, config):
     print(f"   Keywords: {len(kw_results)} | Accounts: {len(acc_results)}")
 
     if args.json:
-        print_json_summary(all_results)
+        print_json_summary(all_results, now)
 
     return all_results
 
@@ -671,28 +1240,30 @@ def cmd_patrol(args, config):
 def cmd_keywords(args, config):
     state = load_state()
     metrics = load_metrics()
-    results = search_keywords(config, state, metrics, force_all=args.all)
-    save_results(results, 'keywords')
+    now = datetime.now()
+    results = search_keywords(config, state, metrics, force_all=args.all, now=now)
+    save_results(results, 'keywords', now)
     save_state(state)
     save_metrics(metrics)
     if args.json:
-        print_json_summary(results)
+        print_json_summary(results, now)
 
 
 def cmd_accounts(args, config):
     state = load_state()
     metrics = load_metrics()
-    results = fetch_accounts(config, state, metrics, force_all=args.all)
-    save_results(results, 'accounts')
+    now = datetime.now()
+    results = fetch_accounts(config, state, metrics, force_all=args.all, now=now)
+    save_results(results, 'accounts', now)
     save_state(state)
     save_metrics(metrics)
     if args.json:
-        print_json_summary(results)
+        print_json_summary(results, now)
 
 
 def cmd_search(args, config):
     print(f"🔍 Searching: {args.query}")
-    data = call_x_api('search', args.query, '--max-results', str(args.max_results), '--sort-order', 'relevancy')
+    data = call_x_api('search', args.query, max_results=args.max_results, sort_order='relevancy')
     if not data or 'data' not in data:
         print("No results")
         return
@@ -718,7 +1289,8 @@ def cmd_status(args, config):
     keywords = config.get('keywords', {})
     accounts = config.get('accounts', {})
     schedule = config.get('schedule', {})
-    tier2_all = collect_tier2_accounts(accounts)
+    groups = tier2_groups(accounts)
+    tier2_all = collect_tier2_accounts(accounts, groups)
     am = metrics.get("accounts", {})
 
     print("═" * 50)
@@ -734,9 +1306,8 @@ def cmd_status(args, config):
     print(f"\n👥 Accounts:")
     t1 = accounts.get('tier1', [])
     print(f"   Tier1 ({len(t1)}): {', '.join(t1[:5])}{'...' if len(t1)>5 else ''}")
-    for key, val in accounts.items():
-        if key.startswith("tier2") and isinstance(val, list):
-            print(f"   {key} ({len(val)})")
+    for key, val in groups.items():
+        print(f"   {key} ({len(val)})")
     disc = accounts.get('discovered', [])
     unresolved = [d for d in disc if d.isdigit()]
     print(f"   Discovered ({len(disc)}, {len(unresolved)} unresolved IDs)")
@@ -749,10 +1320,11 @@ def cmd_status(args, config):
 
     # Top accounts by engagement
     if am:
-        ranked = sorted(
-            [(k, v) for k, v in am.items() if v.get("total_posts", 0) > 0],
-            key=lambda x: -x[1].get("avg_engagement", 0)
-        )[:5]
+        ranked = heapq.nlargest(
+            5,
+            ((k, v) for k, v in am.items() if v.get("total_posts", 0) > 0),
+            key=lambda x: x[1].get("avg_engagement", 0)
+        )
         if ranked:
             print(f"\n🏆 Top accounts (by engagement):")
             for acct, data in ranked:
@@ -812,60 +1384,90 @@ def cmd_remove_account(args, config):
 
 
 # ── main ───────────────────────────────────────────────────────
-def main():
+# 子命令 → (handler, help, [(参数名, add_argument选项)])；migrate-state 在 main 里处理
+SUBCOMMANDS = {
+    'patrol': (cmd_patrol, 'Run full patrol', [
+        ('--no-cache', dict(action='store_true', help='Ignore the on-disk thread cache')),
+    ]),
+    'keywords': (cmd_keywords, 'Search keywords only', [
+        ('--all', dict(action='store_true', help='Search ALL keywords')),
+    ]),
+    'accounts': (cmd_accounts, 'Fetch accounts only', [
+        ('--all', dict(action='store_true', help='Fetch ALL accounts')),
+        ('--no-cache', dict(action='store_true', help='Ignore the on-disk thread cache')),
+    ]),
+    'search': (cmd_search, 'Ad-hoc search (no state change)', [
+        ('query', {}),
+        ('--max-results', dict(type=int, default=20)),
+    ]),
+    'status': (cmd_status, 'Show config status', []),
+    'maintain': (cmd_maintain, 'Analyze watchlist quality & auto-maintain', [
+        ('--apply', dict(action='store_true', help='Auto-remove dead accounts')),
+    ]),
+    'health': (cmd_health, 'Quick health check (JSON output for agent)', []),
+    'add-keyword': (cmd_add_keyword, 'Add a keyword', [
+        ('keyword', {}),
+        ('--tier', dict(choices=['core', 'trending'], default='trending')),
+    ]),
+    'add-account': (cmd_add_account, 'Add an account', [
+        ('account', {}),
+        ('--tier', dict(default='tier2_builders')),
+    ]),
+    'remove-keyword': (cmd_remove_keyword, 'Remove a keyword', [('keyword', {})]),
+    'remove-account': (cmd_remove_account, 'Remove an account', [('account', {})]),
+    'migrate-state': (None, 'Migrate state from watchlist YAML to JSON', []),
+}
+
+
+LEGACY_SCHEDULE_KEYS = ('keyword_index', 'account_index', 'last_run')
+
+
+def needs_migration(config: dict) -> bool:
+    """watchlist里还留着旧版写进去的轮询状态（seen_posts 或 schedule 下的索引/last_run）"""
+    schedule = config.get('schedule') or {}
+    return 'seen_posts' in config or any(k in schedule for k in LEGACY_SCHEDULE_KEYS)
+
+
+def build_parser(argv: list) -> argparse.ArgumentParser:
+    """只为要跑的子命令建子parser；没给命令、-h 或命令拼错时全部建上，帮助和报错信息不变"""
     parser = argparse.ArgumentParser(description="Scout X Patrol")
     parser.add_argument('--json', action='store_true', help='Output JSON summary to stdout')
     subparsers = parser.add_subparsers(dest='command')
 
-    subparsers.add_parser('patrol', help='Run full patrol')
-
-    kw_p = subparsers.add_parser('keywords', help='Search keywords only')
-    kw_p.add_argument('--all', action='store_true', help='Search ALL keywords')
+    wanted = next((arg for arg in argv if not arg.startswith('-')), None)
+    names = [wanted] if wanted in SUBCOMMANDS else SUBCOMMANDS
+    for name in names:
+        _, help_text, arguments = SUBCOMMANDS[name]
+        sub = subparsers.add_parser(name, help=help_text)
+        for arg, options in arguments:
+            sub.add_argument(arg, **options)
+    return parser
 
-    acc_p = subparsers.add_parser('accounts', help='Fetch accounts only')
-    acc_p.add_argument('--all', action='store_true', help='Fetch ALL accounts')
-
-    search_p = subparsers.add_parser('search', help='Ad-hoc search (no state change)')
-    search_p.add_argument('query')
-    search_p.add_argument('--max-results', type=int, default=20)
-
-    subparsers.add_parser('status', help='Show config status')
-
-    maintain_p = subparsers.add_parser('maintain', help='Analyze watchlist quality & auto-maintain')
-    maintain_p.add_argument('--apply', action='store_true', help='Auto-remove dead accounts')
-
-    subparsers.add_parser('health', help='Quick health check (JSON output for agent)')
-
-    add_kw = subparsers.add_parser('add-keyword', help='Add a keyword')
-    add_kw.add_argument('keyword')
-    add_kw.add_argument('--tier', choices=['core', 'trending'], default='trending')
-
-    add_acc = subparsers.add_parser('add-account', help='Add an account')
-    add_acc.add_argument('account')
-    add_acc.add_argument('--tier', default='tier2_builders')
-
-    rm_kw = subparsers.add_parser('remove-keyword', help='Remove a keyword')
-    rm_kw.add_argument('keyword')
-
-    rm_acc = subparsers.add_parser('remove-account', help='Remove an account')
-    rm_acc.add_argument('account')
-
-    subparsers.add_parser('migrate-state', help='Migrate state from watchlist YAML to JSON')
 
+def main():
+    parser = build_parser(sys.argv[1:])
     args = parser.parse_args()
     if not args.command:
         parser.print_help()
         sys.exit(1)
+    if getattr(args, 'no_cache', False):
+        global thread_cache_enabled
+        thread_cache_enabled = False
 
     config = load_config()
 
     # One-time migration
-    if args.command == 'migrate-state' or (not STATE_PATH.exists() and 'seen_posts' in config):
+    if args.command == 'migrate-state' and not needs_migration(config):
+        # 已经迁移过：不要用默认值覆盖现有的 x-patrol-state.json
+        print("✅ Nothing to migrate")
+        return
+    if args.command == 'migrate-state' or (not STATE_PATH.exists() and needs_migration(config)):
+        schedule = config.get('schedule') or {}
         state = {
-            "keyword_index": config.get('schedule', {}).pop('keyword_index', 0),
-            "account_index": config.get('schedule', {}).pop('account_index', 0),
+            "keyword_index": schedule.pop('keyword_index', 0),
+            "account_index": schedule.pop('account_index', 0),
             "seen_posts": config.pop('seen_posts', []),
-            "last_run": config.get('schedule', {}).pop('last_run', None),
+            "last_run": schedule.pop('last_run', None),
         }
         save_state(state)
         save_config(config)
@@ -873,23 +1475,12 @@ def main():
         if args.command == 'migrate-state':
             return
 
-    commands = {
-        'patrol': cmd_patrol,
-        'keywords': cmd_keywords,
-        'accounts': cmd_accounts,
-        'search': cmd_search,
-        'status': cmd_status,
-        'maintain': cmd_maintain,
-        'health': cmd_health,
-        'add-keyword': cmd_add_keyword,
-        'add-account': cmd_add_account,
-        'remove-keyword': cmd_remove_keyword,
-        'remove-account': cmd_remove_account,
-    }
-
-    fn = commands.get(args.command)
+    fn = SUBCOMMANDS[args.command][0]
     if fn:
-        fn(args, config)
+        try:
+            fn(args, config)
+        finally:
+            save_rate_limits()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,92 @@
+import sys
+import time
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
+
+import scout_x  # noqa: E402
+from scout_x import BloomFilter, SeenPosts  # noqa: E402
+
+
+class TestBloomFilter(unittest.TestCase):
+    def test_membership_and_round_trip(self) -> None:
+        bf = BloomFilter()
+        ids = [str(1_800_000_000_000_000_000 + i) for i in range(200)]
+        for pid in ids:
+            bf.add(pid)
+        self.assertTrue(all(pid in bf for pid in ids))
+        restored = BloomFilter.loads(bf.dumps())
+        self.assertTrue(all(pid in restored for pid in ids))
+
+    def test_false_positive_rate(self) -> None:
+        bf = BloomFilter(capacity=1000, fp_rate=0.01)
+        for i in range(1000):
+            bf.add(f"seen-{i}")
+        false_hits = sum(f"new-{i}" in bf for i in range(10_000))
+        self.assertLess(false_hits, 300)
+
+    def test_loads_discards_filter_of_other_size(self) -> None:
+        small = BloomFilter(capacity=10)
+        small.add("x")
+        self.assertNotIn("x", BloomFilter.loads(small.dumps()))
+
+
+class TestSeenPosts(unittest.TestCase):
+    def setUp(self) -> None:
+        self.now = datetime(2026, 10, 16, 12, 0)
+
+    def _reload(self, seen: SeenPosts, days: float) -> SeenPosts:
+        state = {}
+        seen.save(state)
+        state["seen_posts"] = []  # 只靠bloom filter记住
+        return SeenPosts(state, now=self.now + timedelta(days=days))
+
+    def test_old_state_list_is_migrated(self) -> None:
+        seen = SeenPosts({"seen_posts": ["1", "2"]}, now=self.now)
+        self.assertIn("1", seen)
+        self.assertNotIn("3", seen)
+        self.assertNotIn("", seen)
+
+    def test_recent_window_is_bounded(self) -> None:
+        seen = SeenPosts({}, now=self.now)
+        for i in range(scout_x.SEEN_RECENT + 10):
+            seen.add(str(i))
+        state = {}
+        seen.save(state)
+        self.assertEqual(len(state["seen_posts"]), scout_x.SEEN_RECENT)
+        self.assertEqual(state["seen_posts"][-1], str(scout_x.SEEN_RECENT + 9))
+        self.assertIn("0", seen)  # 移出精确窗口后仍由bloom filter记住
+
+    def test_rotation_keeps_one_previous_filter(self) -> None:
+        seen = SeenPosts({}, now=self.now)
+        seen.add("old")
+        days = scout_x.SEEN_BLOOM_ROTATE_DAYS
+        seen = self._reload(seen, days - 1)
+        self.assertIn("old", seen)
+        self.assertIsNone(seen.previous)
+
+        seen = self._reload(seen, days)  # 第一次轮换：old 进入 previous
+        self.assertIn("old", seen)
+        self.assertIsNotNone(seen.previous)
+        seen.add("new")
+
+        seen = self._reload(seen, 2 * days)  # 第二次轮换：old 被丢弃
+        self.assertNotIn("old", seen)
+        self.assertIn("new", seen)
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+
+class TestRateLimiterRemaining(unittest.TestCase):
+    def test_remaining_is_unknown_without_live_window(self) -> None:
+        limiter = scout_x.RateLimiter()
+        bucket = scout_x.RateLimiter.bucket('/2/tweets/search/recent')
+        self.assertIsNone(limiter.remaining(bucket))
+        limiter.buckets[bucket] = {'limit': 60, 'remaining': 3, 'reset': time.time() + 60}
+        self.assertEqual(limiter.remaining(bucket), 3)
+        limiter.buckets[bucket]['reset'] = time.time() - 1
+        self.assertIsNone(limiter.remaining(bucket))
@@ -10,17 +10,32 @@ Scout YouTube Patrol v7 - yt-dlp powered + shared-knowledge integration
 """
 
 import argparse
+import contextlib
+import functools
+import hashlib
 import json
 import os
 import re
+import shutil
 import subprocess
 import sys
+import tempfile
+import threading
+import time
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+from itertools import islice
 from pathlib import Path
 
 import yaml
 
+# ── orjson (optional, faster JSON decode/encode) ──────────────────
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
 # ── Shared Knowledge Hub ──────────────────────────────────────────
 SHARED_KNOWLEDGE_DIR = Path(os.environ.get(
     "SHARED_KNOWLEDGE_DIR",
@@ -44,20 +59,44 @@ WATCHLIST_PATH  = WORKSPACE / "sources" / "yt-watchlist.yaml"
 STATE_PATH      = WORKSPACE / "sources" / "yt-patrol-state.json"
 METRICS_PATH    = WORKSPACE / "sources" / "yt-watchlist-metrics.json"
 RAW_DIR         = SHARED_KNOWLEDGE_DATA / "raw" / "youtube"
+CACHE_DIR       = WORKSPACE / "cache" / "yt"
+ICLOUD_RAW_DIR  = Path(os.path.expanduser(
+    "~/Library/Mobile Documents/iCloud~md~obsidian/Documents/OpenClaw_Vault/Scout/raw/youtube"
+))
 
 LONG_VIDEO_THRESHOLD = 2700   # 45 min → map-reduce
 CHUNK_SIZE           = 20000  # ~20 KB per chunk
 MAX_WORKERS          = 3
+MAP_WORKERS          = 8      # 单个长视频 map 阶段并发的 Gemini 请求数（纯网络等待）
+SCAN_WORKERS         = 8      # 并发列频道视频的 yt-dlp 进程数
 
 GEMINI_MODEL = "gemini-3-flash-preview"
 
+# yt-dlp 结果缓存（秒）：频道列表变化快，视频元数据基本不变，字幕不会变（永久）
+CHANNEL_CACHE_TTL = 15 * 60
+INFO_CACHE_TTL    = 7 * 24 * 3600
+cache_enabled     = True   # --no-cache 时关掉
+
 
 # ── helpers ──────────────────────────────────────────────────────
 
+_SLUG_NONWORD  = re.compile(r'[^\w\s-]')
+_SLUG_SEP      = re.compile(r'[\s_-]+')
+_ISO8601       = re.compile(r'PT(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?')
+# SRT 正文行：去掉首尾空白，跳过空行、序号行、时间轴行（[^\S\n] = 不跨行的空白）
+_SRT_TEXT      = re.compile(
+    r'^[^\S\n]*(?!\d+[^\S\n]*$|\d{2}:\d{2}:\d{2},\d{3}[^\S\n]*-->)(\S(?:.*\S)?)[^\S\n]*$',
+    re.MULTILINE,
+)
+_TOPIC_NONWORD = re.compile(r'[^\w\u4e00-\u9fff\s-]')
+_WHITESPACE    = re.compile(r'\s+')
+
+
+@functools.lru_cache(maxsize=512)
 def slugify(text: str) -> str:
     text = text.lower()
-    text = re.sub(r'[^\w\s-]', '', text)
-    text = re.sub(r'[\s_-]+', '-', text)
+    text = _SLUG_NONWORD.sub('', text)
+    text = _SLUG_SEP.sub('-', text)
     return text.strip('-')
 
 
@@ -71,13 +110,65 @@ def parse_video_id(raw: str) -> str:
 
 
 def parse_iso8601_duration(iso: str) -> int:
-    m = re.match(r'PT(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?', iso)
+    m = _ISO8601.match(iso)
     if not m:
         return 0
     h, mi, s = (int(v) if v else 0 for v in m.groups())
     return h * 3600 + mi * 60 + s
 
 
+def atomic_write(path: Path, data: bytes):
+    """先写同目录临时文件再os.replace，中途被杀不会留下写了一半的文件"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def dump_json(obj, indent: bool = True) -> bytes:
+    """UTF-8 JSON；有orjson时用它，输出与标准库相同"""
+    if HAS_ORJSON:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=option)
+    return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None).encode('utf-8')
+
+
+def loads_json(data: str | bytes):
+    return orjson.loads(data) if HAS_ORJSON else json.loads(data)
+
+
+def load_json(path: Path):
+    return loads_json(path.read_bytes())
+
+
+# ── yt-dlp cache ─────────────────────────────────────────────────
+
+def _cache_path(key: str) -> Path:
+    return CACHE_DIR / f"{hashlib.sha1(key.encode('utf-8')).hexdigest()}.json"
+
+
+def _cache_get(key: str, ttl: float | None = None):
+    """命中且未过期时返回缓存值，否则 None；ttl=None 表示永不过期。"""
+    if not cache_enabled:
+        return None
+    try:
+        entry = load_json(_cache_path(key))
+    except (OSError, ValueError):
+        return None
+    if ttl is not None and time.time() - entry.get("cached_at", 0) > ttl:
+        return None
+    return entry.get("value")
+
+
+def _cache_set(key: str, value):
+    try:
+        atomic_write(_cache_path(key), dump_json({"key": key, "cached_at": time.time(), "value": value}, indent=False))
+    except OSError as e:
+        print(f"  Warning: cache write failed: {e}", file=sys.stderr)
+
+
 # ── config ───────────────────────────────────────────────────────
 
 def load_config() -> dict:
@@ -89,16 +180,15 @@ def load_config() -> dict:
 
 
 def save_config(config: dict):
-    with open(WATCHLIST_PATH, 'w') as f:
-        yaml.dump(config, f, allow_unicode=True, default_flow_style=False, sort_keys=False)
+    text = yaml.dump(config, allow_unicode=True, default_flow_style=False, sort_keys=False)
+    atomic_write(WATCHLIST_PATH, text.encode('utf-8'))
 
 
 # ── state (separated from config) ───────────────────────────────
 
 def load_state() -> dict:
     if STATE_PATH.exists():
-        with open(STATE_PATH, 'r') as f:
-            return json.load(f)
+        return load_json(STATE_PATH)
     return {
         "channel_index": 0,
         "last_run": None,
@@ -107,24 +197,19 @@ def load_state() -> dict:
 
 
 def save_state(state: dict):
-    STATE_PATH.parent.mkdir(parents=True, exist_ok=True)
-    with open(STATE_PATH, 'w') as f:
-        json.dump(state, f, indent=2)
+    atomic_write(STATE_PATH, dump_json(state))
 
 
 # ── metrics ──────────────────────────────────────────────────────
 
 def load_metrics() -> dict:
     if METRICS_PATH.exists():
-        with open(METRICS_PATH, 'r') as f:
-            return json.load(f)
+        return load_json(METRICS_PATH)
     return {"channels": {}, "last_maintain": None}
 
 
 def save_metrics(metrics: dict):
-    METRICS_PATH.parent.mkdir(parents=True, exist_ok=True)
-    with open(METRICS_PATH, 'w') as f:
-        json.dump(metrics, f, indent=2, ensure_ascii=False)
+    atomic_write(METRICS_PATH, dump_json(metrics))
 
 
 def update_channel_metrics(metrics: dict, slug: str, result: dict):
@@ -168,39 +253,71 @@ def _run_ytdlp(args: list, timeout: int = 60) -> subprocess.CompletedProcess:
 
 
 def get_channel_videos(handle: str, max_results: int = 5, config: dict | None = None) -> list[dict]:
-    """List recent videos from a channel using yt-dlp --flat-playlist."""
+    """List recent videos from a channel using yt-dlp --flat-playlist.
+
+    Output is streamed line by line; once max_results videos are parsed
+    yt-dlp is stopped instead of waiting for it to exit.
+    """
     handle = handle if handle.startswith("@") else f"@{handle}"
     url = f"https://www.youtube.com/{handle}/videos"
+    cache_key = f"channel:{handle}:{max_results}"
+    cached = _cache_get(cache_key, CHANNEL_CACHE_TTL)
+    if cached is not None:
+        return cached
+    cmd = ["yt-dlp", "--no-warnings", "--no-check-certificates",
+           "--flat-playlist", "--lazy-playlist", "--dump-json",
+           "--playlist-end", str(max_results),
+           url]
     try:
-        result = _run_ytdlp([
-            "--flat-playlist", "--dump-json",
-            "--playlist-end", str(max_results),
-            url,
-        ], timeout=30)
-        if result.returncode != 0:
-            print(f"  Warning: yt-dlp failed for {handle}: {result.stderr[:200]}", file=sys.stderr, flush=True)
-            return []
-        videos = []
-        for line in result.stdout.strip().split('\n'):
-            if not line.strip():
-                continue
+        # stderr 写临时文件，避免 stdout 边读边处理时 stderr 管道写满卡死
+        with tempfile.TemporaryFile(mode="w+", encoding="utf-8") as err:
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=err,
+                                    text=True, encoding="utf-8")
+            timed_out = threading.Event()
+
+            def _kill():
+                timed_out.set()
+                proc.kill()
+
+            timer = threading.Timer(30, _kill)
+            timer.start()
+            videos = []
             try:
-                d = json.loads(line)
-                vid = d.get("id", "")
-                if not vid:
-                    continue
-                videos.append({
-                    "id": vid,
-                    "title": d.get("title", "Unknown"),
-                    "duration": int(d.get("duration") or 0),
-                    "url": f"https://www.youtube.com/watch?v={vid}",
-                })
-            except json.JSONDecodeError:
-                continue
+                for line in proc.stdout:
+                    if not line.strip():
+                        continue
+                    try:
+                        d = loads_json(line)
+                    except json.JSONDecodeError:
+                        continue
+                    vid = d.get("id", "")
+                    if not vid:
+                        continue
+                    videos.append({
+                        "id": vid,
+                        "title": d.get("title", "Unknown"),
+                        "duration": int(d.get("duration") or 0),
+                        "url": f"https://www.youtube.com/watch?v={vid}",
+                    })
+                    if len(videos) >= max_results:
+                        break
+            finally:
+                timer.cancel()
+                done = len(videos) >= max_results
+                if done and proc.poll() is None:
+                    proc.terminate()
+                proc.stdout.close()
+                proc.wait()
+
+            if timed_out.is_set():
+                print(f"  Warning: yt-dlp timeout for {handle}", file=sys.stderr, flush=True)
+                return []
+            if proc.returncode != 0 and not done:
+                err.seek(0)
+                print(f"  Warning: yt-dlp failed for {handle}: {err.read(200)}", file=sys.stderr, flush=True)
+                return []
+        _cache_set(cache_key, videos)
         return videos
-    except subprocess.TimeoutExpired:
-        print(f"  Warning: yt-dlp timeout for {handle}", file=sys.stderr, flush=True)
-        return []
     except Exception as e:
         print(f"  Warning: Failed to get videos for {handle}: {e}", file=sys.stderr, flush=True)
         return []
@@ -209,13 +326,17 @@ def get_channel_videos(handle: str, max_results: int = 5, config: dict | None =
 def get_video_info(video_id: str) -> dict | None:
     """Get video metadata using yt-dlp --dump-json."""
     url = f"https://www.youtube.com/watch?v={video_id}"
+    cache_key = f"info:{video_id}"
+    cached = _cache_get(cache_key, INFO_CACHE_TTL)
+    if cached is not None:
+        return cached
     try:
         result = _run_ytdlp(["--dump-json", "--skip-download", url], timeout=30)
         if result.returncode != 0:
             print(f"[yt-dlp] Failed to get info: {result.stderr[:200]}", file=sys.stderr)
             return None
-        d = json.loads(result.stdout)
-        return {
+        d = loads_json(result.stdout)
+        info = {
             "videoId": d.get("id", video_id),
             "title": d.get("title", "Unknown"),
             "channel": d.get("channel", d.get("uploader", "Unknown")),
@@ -225,6 +346,8 @@ def get_video_info(video_id: str) -> dict | None:
             "likes": d.get("like_count"),
             "description": (d.get("description") or "")[:500],
         }
+        _cache_set(cache_key, info)
+        return info
     except Exception as e:
         print(f"[yt-dlp] Failed to get video info: {e}", file=sys.stderr)
         return None
@@ -232,47 +355,90 @@ def get_video_info(video_id: str) -> dict | None:
 
 # ── transcript (yt-dlp powered) ──────────────────────────────────
 
-def _try_ytdlp_subs(video_id: str, langs: tuple = ("en",)) -> str | None:
-    """Download subtitles using yt-dlp. Fast, reliable, no IP issues."""
-    import tempfile
+@functools.lru_cache(maxsize=1)
+def _ytdlp_lib():
+    """yt_dlp.YoutubeDL if the yt-dlp package is importable here, else None (use the CLI)."""
+    try:
+        from yt_dlp import YoutubeDL
+    except ImportError:
+        return None
+    return YoutubeDL
+
+
+def _download_subs(url: str, langs: tuple, out_template: str):
+    """Write <id>.<lang>.srt next to out_template; manual subs first, then auto-generated."""
+    YoutubeDL = _ytdlp_lib()
+    if YoutubeDL is None:
+        _run_ytdlp([
+            "--write-subs", "--write-auto-subs",
+            "--sub-langs", ",".join(langs),
+            "--sub-format", "srt",
+            "--skip-download",
+            "-o", out_template,
+            url,
+        ], timeout=30)
+        return
+    # 进程内调用，省掉每个视频一次的 yt-dlp 启动；YoutubeDL 实例不跨线程共用，每次新建
+    opts = {
+        "writesubtitles": True,
+        "writeautomaticsub": True,
+        "subtitleslangs": list(langs),
+        "subtitlesformat": "srt",
+        "skip_download": True,
+        "outtmpl": out_template,
+        "quiet": True,
+        "no_warnings": True,
+        "noprogress": True,
+        "nocheckcertificate": True,
+        "socket_timeout": 30,
+    }
+    with YoutubeDL(opts) as ydl:
+        ydl.download([url])
+
+
+def _find_srt(tmpdir: str, video_id: str, langs: tuple) -> Path | None:
+    """yt-dlp names subtitles <id>.<lang>.srt; probe those paths in langs order before listing the dir."""
+    for lang in langs:
+        path = Path(tmpdir, f"{video_id}.{lang}.srt")
+        if path.is_file():
+            return path
+    # 语言写成 en.* 这类模式时文件名对不上，退回按 id 前缀扫目录（共享目录里还有别的视频）
+    prefix = f"{video_id}."
+    with os.scandir(tmpdir) as it:
+        for entry in it:
+            if entry.name.startswith(prefix) and entry.name.endswith(".srt"):
+                return Path(entry.path)
+    return None
+
+
+def _try_ytdlp_subs(video_id: str, langs: tuple = ("en",), tmpdir: str | None = None) -> str | None:
+    """Download subtitles using yt-dlp. Fast, reliable, no IP issues.
+
+    tmpdir: shared scratch dir (one per patrol); a private one is created when omitted.
+    """
     url = f"https://www.youtube.com/watch?v={video_id}"
-    with tempfile.TemporaryDirectory() as tmpdir:
+    lang_str = ",".join(langs)
+    cache_key = f"subs:{video_id}:{lang_str}"
+    cached = _cache_get(cache_key)
+    if cached is not None:
+        print(f"[yt-dlp-subs] Got {len(cached)} chars (cached)", file=sys.stderr)
+        return cached
+    scratch = contextlib.nullcontext(tmpdir) if tmpdir else tempfile.TemporaryDirectory()
+    with scratch as tmpdir:
         out_template = os.path.join(tmpdir, "%(id)s")
-        lang_str = ",".join(langs)
         try:
-            # Try manual subs first, then auto-generated
-            result = _run_ytdlp([
-                "--write-subs", "--write-auto-subs",
-                "--sub-langs", lang_str,
-                "--sub-format", "srt",
-                "--skip-download",
-                "-o", out_template,
-                url,
-            ], timeout=30)
-
-            # Find the subtitle file
-            for f in os.listdir(tmpdir):
-                if f.endswith(".srt"):
-                    srt_path = os.path.join(tmpdir, f)
-                    with open(srt_path, "r", encoding="utf-8") as fh:
-                        srt_text = fh.read()
-                    # Convert SRT to plain text (strip timestamps and indices)
-                    lines = []
-                    for line in srt_text.split('\n'):
-                        line = line.strip()
-                        if not line:
-                            continue
-                        if re.match(r'^\d+$', line):
-                            continue
-                        if re.match(r'\d{2}:\d{2}:\d{2},\d{3}\s*-->', line):
-                            continue
-                        lines.append(line)
-                    text = ' '.join(lines)
-                    if len(text) > 200:
-                        print(f"[yt-dlp-subs] Got {len(text)} chars", file=sys.stderr)
-                        return text
-                    print(f"[yt-dlp-subs] Too short ({len(text)} chars)", file=sys.stderr)
-                    return None
+            _download_subs(url, langs, out_template)
+
+            srt_path = _find_srt(tmpdir, video_id, langs)
+            if srt_path is not None:
+                # Convert SRT to plain text (strip timestamps and indices)
+                text = ' '.join(_SRT_TEXT.findall(srt_path.read_text(encoding="utf-8")))
+                if len(text) > 200:
+                    print(f"[yt-dlp-subs] Got {len(text)} chars", file=sys.stderr)
+                    _cache_set(cache_key, text)
+                    return text
+                print(f"[yt-dlp-subs] Too short ({len(text)} chars)", file=sys.stderr)
+                return None
 
             print("[yt-dlp-subs] No subtitle file found", file=sys.stderr)
             return None
@@ -299,7 +465,6 @@ def _try_gemini_direct_summary(
     so frames = duration_s * fps <= 9000 (safety margin).
     """
     try:
-        from google import genai
         from google.genai import types
         client = _get_gemini_client()
 
@@ -393,9 +558,9 @@ def _try_gemini_direct_summary(
         return None
 
 
-def get_transcript(video_id: str, langs: tuple = ("en",)) -> tuple:
+def get_transcript(video_id: str, langs: tuple = ("en",), tmpdir: str | None = None) -> tuple:
     """Get transcript using yt-dlp subtitles (primary) → Gemini direct (fallback)."""
-    text = _try_ytdlp_subs(video_id, langs)
+    text = _try_ytdlp_subs(video_id, langs, tmpdir)
     if text:
         return text, None
 
@@ -404,7 +569,9 @@ def get_transcript(video_id: str, langs: tuple = ("en",)) -> tuple:
 
 # ── Gemini API ───────────────────────────────────────────────────
 
+@functools.lru_cache(maxsize=1)
 def _get_gemini_client():
+    """进程内共用一个 client（复用 HTTP 连接池）。"""
     try:
         from google import genai
     except ImportError:
@@ -488,8 +655,9 @@ def summarize_mapreduce(transcript: str, video_title: str,
     print(f"    [map-reduce] Split into {total} chunks", flush=True)
 
     all_points = [""] * total
-    print(f"    [map-reduce] Map phase ({MAX_WORKERS} workers)...", flush=True)
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+    workers = min(MAP_WORKERS, total)
+    print(f"    [map-reduce] Map phase ({workers} workers)...", flush=True)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
         futures = {executor.submit(_map_chunk, chunk, i, total): i for i, chunk in enumerate(chunks)}
         for future in as_completed(futures):
             idx = futures[future]
@@ -526,7 +694,8 @@ def summarize_mapreduce(transcript: str, video_title: str,
 
 # ── video processing ─────────────────────────────────────────────
 
-def process_video(video: dict, channel_slug: str, processed_set: set) -> dict:
+def process_video(video: dict, channel_slug: str, processed_set: set | dict,
+                  tmpdir: str | None = None) -> dict:
     video_id    = video['id']
     video_title = video['title']
     video_url   = video['url']
@@ -536,6 +705,7 @@ def process_video(video: dict, channel_slug: str, processed_set: set) -> dict:
     result = {
         'id': video_id, 'title': video_title, 'url': video_url,
         'channel': channel_slug, 'success': False, 'error': None,
+        'files': [],
     }
 
     if video_id in processed_set:
@@ -569,7 +739,7 @@ def process_video(video: dict, channel_slug: str, processed_set: set) -> dict:
 
     # Step 1: transcript
     print(f"    Step 1: Getting transcript...", flush=True)
-    transcript_text, error = get_transcript(video_id)
+    transcript_text, error = get_transcript(video_id, tmpdir=tmpdir)
 
     dur_sec = int(duration) % 60
     summary = None
@@ -578,6 +748,7 @@ def process_video(video: dict, channel_slug: str, processed_set: set) -> dict:
         with open(transcript_file, 'w', encoding='utf-8') as f:
             f.write(f"# {video_title}\n# URL: {video_url}\n# Date: {date_str}\n\n")
             f.write(transcript_text)
+        result['files'].append(str(transcript_file))
         print(f"    Transcript saved ({len(transcript_text)} chars)", flush=True)
 
         # Step 2: summarize from transcript
@@ -622,10 +793,43 @@ def process_video(video: dict, channel_slug: str, processed_set: set) -> dict:
     print(f"    Summary saved: {summary_file.name}", flush=True)
     result['success'] = True
     result['file'] = str(summary_file)
+    result['files'].append(str(summary_file))
     result['summary_preview'] = summary[:300]
     return result
 
 
+def sync_to_icloud(results: list[dict], state: dict):
+    """把本次写出的 transcript / summary 拷到 iCloud（同样的相对路径），不再每次整树 rsync。
+
+    拷贝失败的文件记进 state['icloud_sync_failed']（调用方负责 save_state）。
+    上次有失败、或第一次用这套逻辑（state 里还没有这个键）时，改为对 RAW_DIR 整树做一次
+    增量同步：目标缺失或大小/mtime 不同才拷，补齐失败的文件和其他途径写进 raw/youtube 的文件。
+    """
+    if state.get('icloud_sync_failed', True):
+        print("  Catching up: incremental sync of the whole raw/youtube tree", flush=True)
+        files = [p for p in RAW_DIR.rglob('*') if p.is_file() and p.name != '.DS_Store']
+    else:
+        files = [Path(path) for r in results for path in r.get('files', ())]
+    failed = []
+    for src in files:
+        dst = ICLOUD_RAW_DIR / src.relative_to(RAW_DIR)
+        try:
+            st = src.stat()
+            try:
+                dst_st = dst.stat()
+            except FileNotFoundError:
+                dst_st = None
+            # copy2 保留 mtime，大小和 mtime 都一致说明已经同步过
+            if dst_st and dst_st.st_size == st.st_size and dst_st.st_mtime_ns == st.st_mtime_ns:
+                continue
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(src, dst)
+        except OSError as e:
+            print(f"  Warning: iCloud sync failed for {src.name}: {e}", file=sys.stderr)
+            failed.append(str(src.relative_to(RAW_DIR)))
+    state['icloud_sync_failed'] = failed
+
+
 # ── migration ────────────────────────────────────────────────────
 
 def maybe_migrate(config: dict, state: dict) -> bool:
@@ -665,7 +869,8 @@ def cmd_patrol(args, config):
     channels_config = config.get('channels', {})
     schedule        = config.get('schedule', {})
     processing      = config.get('processing', {})
-    processed       = set(state.get('processed_videos', []))
+    # 有序 dict 当 LRU 用：O(1) 判重，且保留处理先后，截断时丢最旧的
+    processed       = dict.fromkeys(state.get('processed_videos', []))
 
     tier1 = channels_config.get('tier1', [])
     tier2 = channels_config.get('tier2', [])
@@ -690,24 +895,26 @@ def cmd_patrol(args, config):
     min_dur = processing.get('min_duration_seconds', 120)
     max_dur = processing.get('max_duration_seconds', 7200)
 
-    # Phase 1: collect videos
+    # Phase 1: collect videos（各频道的 yt-dlp 并发跑，结果按频道顺序处理）
     print(f"\nScanning {len(channels_to_check)} channels...", flush=True)
     all_videos: list = []
-    for channel in channels_to_check:
-        handle = channel.get('handle')
+    with ThreadPoolExecutor(max_workers=max(1, min(SCAN_WORKERS, len(channels_to_check)))) as executor:
+        listings = [
+            executor.submit(get_channel_videos, channel.get('handle'), 5, config)
+            for channel in channels_to_check
+        ]
+    for channel, listing in zip(channels_to_check, listings):
         name   = channel.get('name')
-        slug   = channel.get('slug', slugify(name))
+        slug   = channel['slug'] if 'slug' in channel else slugify(name)
         print(f"  {name}", flush=True)
-        videos = get_channel_videos(handle, max_results=5, config=config)
-        count = 0
-        for video in videos:
-            if count >= videos_per_channel:
-                break
-            if video['id'] in processed or video.get('duration', 0) < min_dur or video.get('duration', 0) > max_dur:
-                continue
+        # 过滤和计数合成一趟：凑够 videos_per_channel 个就停
+        fresh = (
+            v for v in listing.result()
+            if v['id'] not in processed and min_dur <= v.get('duration', 0) <= max_dur
+        )
+        for video in islice(fresh, videos_per_channel):
             video['channel_slug'] = slug
             all_videos.append(video)
-            count += 1
 
     if not all_videos:
         print("\nNo new videos to process", flush=True)
@@ -717,11 +924,12 @@ def cmd_patrol(args, config):
 
     print(f"\nProcessing {len(all_videos)} videos in parallel...\n", flush=True)
 
-    # Phase 2: parallel processing
+    # Phase 2: parallel processing（字幕下载共用一个临时目录）
     results = []
-    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(all_videos))) as executor:
+    with tempfile.TemporaryDirectory(prefix="scout-yt-") as subs_tmp, \
+            ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(all_videos))) as executor:
         futures = {
-            executor.submit(process_video, v, v['channel_slug'], processed): v
+            executor.submit(process_video, v, v['channel_slug'], processed, subs_tmp): v
             for v in all_videos
         }
         for future in as_completed(futures):
@@ -729,31 +937,23 @@ def cmd_patrol(args, config):
                 result = future.result()
                 results.append(result)
                 if result['success']:
-                    processed.add(result['id'])
+                    processed.pop(result['id'], None)
+                    processed[result['id']] = None
                 # update metrics
                 update_channel_metrics(metrics, result['channel'], result)
             except Exception as e:
                 v = futures[future]
                 print(f"  Exception processing {v['title']}: {e}", flush=True)
 
+    # sync new files to iCloud (failures are recorded in state and retried next run)
+    print("\nSyncing to iCloud...", flush=True)
+    sync_to_icloud(results, state)
+
     # save state (not config)
     state['processed_videos'] = list(processed)[-500:]
     state['last_run'] = datetime.now().isoformat()
     save_state(state)
     save_metrics(metrics)
-    save_config(config)  # for _channel_id_cache
-
-    # sync raw/youtube to iCloud
-    print("\nSyncing to iCloud...", flush=True)
-    src = str(RAW_DIR) + '/'
-    dst = os.path.expanduser(
-        "~/Library/Mobile Documents/iCloud~md~obsidian/Documents/OpenClaw_Vault/Scout/raw/youtube/"
-    )
-    os.makedirs(dst, exist_ok=True)
-    subprocess.run(
-        ['rsync', '-av', '--exclude=.DS_Store', src, dst],
-        capture_output=True,
-    )
 
     # report
     ok     = sum(1 for r in results if r['success'])
@@ -922,8 +1122,8 @@ def _split_summary_chunks(text: str, max_size: int = 2000) -> list[str]:
 def _video_title_to_topic(title: str) -> str:
     """从视频标题生成简短的topic key。"""
     # 去掉特殊字符，保留英文/中文/数字
-    cleaned = re.sub(r'[^\w\u4e00-\u9fff\s-]', '', title.lower())
-    cleaned = re.sub(r'\s+', '-', cleaned.strip())
+    cleaned = _TOPIC_NONWORD.sub('', title.lower())
+    cleaned = _WHITESPACE.sub('-', cleaned.strip())
     return cleaned[:50] if cleaned else ""
 
 
@@ -945,6 +1145,9 @@ def cmd_process(args, config):
     print(f"Duration: {info['duration'] // 60}min", flush=True)
 
     result = process_video(video, slug, set())
+    state = load_state()
+    sync_to_icloud([result], state)
+    save_state(state)
     if result['success']:
         print(f"\nDone: {result.get('file')}", flush=True)
     else:
@@ -1175,7 +1378,7 @@ def cmd_search(args, _config):
             if not line.strip():
                 continue
             try:
-                d = json.loads(line)
+                d = loads_json(line)
                 results.append({
                     "videoId": d.get("id", ""),
                     "title": d.get("title", ""),
@@ -1221,10 +1424,10 @@ def cmd_channel(args, _config):
     url = f"https://www.youtube.com/{handle}"
     try:
         result = _run_ytdlp([
-            "--flat-playlist", "--dump-json", "--playlist-end", "1", url,
+            "--flat-playlist", "--lazy-playlist", "--dump-json", "--playlist-end", "1", url,
         ], timeout=30)
         if result.stdout.strip():
-            d = json.loads(result.stdout.strip().split('\n')[0])
+            d = loads_json(result.stdout.strip().split('\n')[0])
             print(json.dumps({
                 "handle": handle,
                 "channel": d.get("channel", d.get("uploader", "Unknown")),
@@ -1252,6 +1455,7 @@ def main():
     parser = argparse.ArgumentParser(prog="scout_yt",
                                      description="Scout YouTube Patrol v5")
     parser.add_argument('--json', action='store_true', help='Output JSON summary')
+    parser.add_argument('--no-cache', action='store_true', help='Ignore cached yt-dlp results')
     sub = parser.add_subparsers(dest='command')
 
     p = sub.add_parser('patrol', help='Run YouTube patrol')
@@ -1297,6 +1501,9 @@ def main():
     if not args.command:
         parser.print_help()
         sys.exit(1)
+    if args.no_cache:
+        global cache_enabled
+        cache_enabled = False
 
     no_config = {'search', 'transcript', 'info', 'channel'}
     config = {} if args.command in no_config else load_config()